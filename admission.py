@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from metrics import METRICS
+
+# Per-process admission control. Each lane admits a bounded number of
+# concurrent requests and parks a bounded number more; anything beyond that,
+# or anything that waits too long, is rejected with an estimate of when to
+# retry. Cheap and expensive routes get separate lanes, so a spike of
+# simulations cannot starve idea lookups and downloads.
+DEFAULT_MAX_WAIT = 10.0
+# Weight of the newest sample in the service time average
+SERVICE_TIME_ALPHA = 0.2
+
+class Overloaded(Exception):
+    def __init__(self, lane, retry_after, reason):
+        super().__init__(f"{lane} lane overloaded ({reason})")
+        self.lane = lane
+        self.retry_after = retry_after
+        self.reason = reason
+
+class Lane:
+    def __init__(self, name, max_concurrent, max_queue, max_wait=DEFAULT_MAX_WAIT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 1.0
+        self.rejected = 0
+        self.admitted = 0
+
+    def retry_after(self):
+        # Caller holds self.cond. Seconds until the queue ahead of a new request should have drained
+        return max(1, math.ceil((self.waiting + 1) * self.service_time / self.max_concurrent))
+
+    def acquire(self):
+        start = time.perf_counter()
+        with self.cond:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise Overloaded(self.name, self.retry_after(), "queue full")
+                self.waiting += 1
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected += 1
+                            raise Overloaded(self.name, self.retry_after(), "wait timed out")
+                        self.cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        METRICS.observe("idea_sim_admission_wait_seconds", time.perf_counter() - start, lane=self.name)
+        return time.perf_counter()
+
+    def release(self, started):
+        elapsed = time.perf_counter() - started
+        with self.cond:
+            self.active -= 1
+            self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            self.cond.notify()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "service_time_s": round(self.service_time, 4),
+                "admitted": self.admitted,
+                "rejected": self.rejected
+            }
+
+class AdmissionController:
+    def __init__(self, lanes):
+        self.lanes = {lane.name: lane for lane in lanes}
+
+    def slot(self, lane):
+        return _Slot(self.lanes[lane])
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+class _Slot:
+    def __init__(self, lane):
+        self.lane = lane
+
+    def __enter__(self):
+        self.started = self.lane.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.lane.release(self.started)
+        return False
@@ -1,14 +1,60 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, g
+import hmac
+import io
 import os
 import json
 import random
 import time
-from simulation_engine import SimulationEngine
+import tempfile
+from simulation_engine import SimulationEngine, DEFAULT_SIMULATION_RUNS, MAX_SIMULATION_RUNS, MIN_TOLERANCE, MAX_TOLERANCE
+from job_manager import JobManager, DEFAULT_JOB_DIR
+from admission import AdmissionController, Lane, Overloaded
+from functools import wraps
+from static_assets import StaticAsset
+from metrics import METRICS, PROFILER
+from projection import parse_fields, project
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
+# Results are serialized on every request; key sorting only costs time
+app.json.sort_keys = False
 
 # Initialize the Simulation Engine
-engine = SimulationEngine()
+engine = SimulationEngine(prerender_reports=os.environ.get('REPORT_PRERENDER') == '1')
+jobs = JobManager(engine, max_workers=int(os.environ.get('SIM_JOB_WORKERS', 4)),
+                  max_queue=int(os.environ.get('SIM_JOB_QUEUE', 64)),
+                  directory=os.environ.get('JOB_STORE_DIR', DEFAULT_JOB_DIR))
+
+# Running plus queued expensive requests plus open event streams stay below
+# GUNICORN_THREADS (8), so threads are always left over for the cheap lane.
+# A stream holds its thread until the job ends; streams beyond the cap are
+# refused at once and the page falls back to polling the job.
+admission = AdmissionController([
+    Lane("expensive", max_concurrent=int(os.environ.get('SIM_CONCURRENCY', 2)),
+         max_queue=int(os.environ.get('SIM_QUEUE', 4)), max_wait=float(os.environ.get('SIM_QUEUE_TIMEOUT', 10))),
+    Lane("cheap", max_concurrent=int(os.environ.get('CHEAP_CONCURRENCY', 8)),
+         max_queue=int(os.environ.get('CHEAP_QUEUE', 32)), max_wait=float(os.environ.get('CHEAP_QUEUE_TIMEOUT', 5))),
+    Lane("streams", max_concurrent=int(os.environ.get('SSE_STREAMS', 1)), max_queue=0),
+])
+
+def overloaded_response(e):
+    response = jsonify({"error": f"Server busy, please retry in {e.retry_after} s", "lane": e.lane,
+                        "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def admitted(lane):
+    # Runs the view inside an admission slot of `lane`; 429 with Retry-After when the lane is full
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission.slot(lane):
+                    return view(*args, **kwargs)
+            except Overloaded as e:
+                return overloaded_response(e)
+        return wrapper
+    return decorator
 
 INDUSTRY_IDEAS = {
     "tech": [
@@ -37,22 +83,80 @@ INDUSTRY_IDEAS = {
     ]
 }
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = PROFILER.maybe_start(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}")
+
+@app.after_request
+def record_request_time(response):
+    # Streaming responses are timed up to the first byte
+    METRICS.observe("idea_sim_http_request_seconds", time.perf_counter() - g.request_start,
+                    route=request.url_rule.rule if request.url_rule else "unmatched",
+                    method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile:
+        profile.stop()
+
+# The front page and the idea catalog never change while the process runs,
+# so they are rendered and compressed once. The page is revalidated on every
+# load (it changes on deploy), the catalog is cached by clients for an hour.
+with app.app_context():
+    FRONT_PAGE = StaticAsset(render_template('front.html'), 'text/html', 'no-cache')
+IDEA_CATALOG = {
+    industry_id: StaticAsset(json.dumps({"ideas": ideas}), 'application/json', 'public, max-age=3600')
+    for industry_id, ideas in INDUSTRY_IDEAS.items()
+}
+
 @app.route('/')
 def home():
-    return render_template('front.html')
+    return FRONT_PAGE.response(request)
 
 @app.route('/api/industry-ideas/<industry_id>', methods=['GET'])
+@admitted("cheap")
 def get_industry_ideas(industry_id):
-    # Simulate network delay for realism
-    time.sleep(0.5) 
-    
-    ideas = INDUSTRY_IDEAS.get(industry_id, [])
-    if not ideas:
+    catalog = IDEA_CATALOG.get(industry_id)
+    if catalog is None:
         return jsonify({"error": "Industry not found"}), 404
         
-    return jsonify({"ideas": ideas})
+    return catalog.response(request)
+
+def parse_deterministic(data):
+    # None -> engine default; otherwise the client's explicit choice
+    value = data.get('deterministic')
+    return None if value is None else bool(value)
+
+def parse_simulation_runs(data):
+    # Returns (runs, error_message)
+    try:
+        simulation_runs = int(data.get('simulation_runs', DEFAULT_SIMULATION_RUNS))
+    except (TypeError, ValueError):
+        return None, "simulation_runs must be an integer"
+    if simulation_runs < 1 or simulation_runs > MAX_SIMULATION_RUNS:
+        return None, f"simulation_runs must be between 1 and {MAX_SIMULATION_RUNS}"
+    return simulation_runs, None
+
+def parse_sampling(data):
+    # Returns (simulation_runs, tolerance, error_message). With a tolerance, sampling is
+    # adaptive and simulation_runs is only a cap (the maximum unless given).
+    tolerance = data.get('tolerance')
+    if tolerance is not None:
+        try:
+            tolerance = float(tolerance)
+        except (TypeError, ValueError):
+            return None, None, "tolerance must be a number"
+        if not MIN_TOLERANCE <= tolerance <= MAX_TOLERANCE:
+            return None, None, f"tolerance must be between {MIN_TOLERANCE} and {MAX_TOLERANCE}"
+        data = {'simulation_runs': data.get('simulation_runs', MAX_SIMULATION_RUNS)}
+    simulation_runs, error = parse_simulation_runs(data)
+    return simulation_runs, tolerance, error
 
 @app.route('/api/simulate', methods=['POST'])
+@admitted("expensive")
 def simulate():
     data = request.json
     idea_text = data.get('idea')
@@ -60,38 +164,258 @@ def simulate():
     if not idea_text:
         return jsonify({"error": "No idea provided"}), 400
 
-    # Run the simulation
-    # Delays will be handled inside the engine or frontend polling, 
-    # but here we simulate the processing time before returning
-    # In a real async app we'd use a job queue, but for this demo we'll wait.
-    # The requirement says "realistic processing delays (3-7 seconds total) with progress updates"
-    # To support progress updates, we might need a streaming response or just FE simulation.
-    # Given the constraint of a simple POST, the FE simulates the "Simulating..." steps
-    # and we just sleep a bit here to account for "calculation".
-    
-    time.sleep(2) # Backend processing time
-    
+    simulation_runs, tolerance, error = parse_sampling(data)
+    if not error:
+        # e.g. "fields": ["report_id", "blocker_analysis.primary_blocker"]; "*" includes sim_data_flat
+        fields, error = parse_fields(data.get('fields', request.args.get('fields')))
+    if error:
+        return jsonify({"error": error}), 400
+
+    # Run the simulation (memoized results come back without re-running the stages)
     try:
-        result = engine.run_simulation(idea_text)
-        return jsonify(result)
+        result = engine.run_simulation(idea_text, simulation_runs, deterministic=parse_deterministic(data),
+                                       tolerance=tolerance)
+        return jsonify(project(result, fields))
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
+@app.route('/api/sweep', methods=['POST'])
+@admitted("expensive")
+def sweep():
+    # Sensitivity surface over a grid, e.g. {"idea": "...", "grid": {"income_level": ["Aspirers", "Affluent"], "domain": ["FinTech"]}}
+    data = request.json or {}
+    idea_text = data.get('idea')
+
+    if not idea_text:
+        return jsonify({"error": "No idea provided"}), 400
+    grid = data.get('grid') or {}
+    if not isinstance(grid, dict) or not all(isinstance(v, list) for v in grid.values()):
+        return jsonify({"error": "grid must map axis names to lists of values"}), 400
+
+    simulation_runs, error = parse_simulation_runs(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        return jsonify(engine.run_sweep(idea_text, grid, simulation_runs, deterministic=parse_deterministic(data)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+MAX_BATCH_IDEAS = 10000
+
+@app.route('/api/simulate-batch', methods=['POST'])
+def simulate_batch():
+    # Streams one NDJSON line per idea as it completes: {"index": i, "result": {...}} or {"index": i, "error": "..."}
+    data = request.json or {}
+    ideas = data.get('ideas')
+
+    if not isinstance(ideas, list) or not ideas or not all(isinstance(i, str) and i for i in ideas):
+        return jsonify({"error": "ideas must be a non-empty list of strings"}), 400
+    if len(ideas) > MAX_BATCH_IDEAS:
+        return jsonify({"error": f"At most {MAX_BATCH_IDEAS} ideas per batch"}), 400
+
+    simulation_runs, error = parse_simulation_runs(data)
+    if not error:
+        fields, error = parse_fields(data.get('fields'))
+    if error:
+        return jsonify({"error": error}), 400
+    include_pdf = bool(data.get('include_pdf', False))
+
+    # The slot is held until the response is closed, not just until this view returns
+    slot = admission.slot("expensive")
+    try:
+        slot.__enter__()
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    def stream():
+        for i, result in engine.run_batch(ideas, simulation_runs, include_pdf=include_pdf,
+                                           deterministic=parse_deterministic(data)):
+            if isinstance(result, Exception):
+                yield json.dumps({"index": i, "error": str(result)}, separators=(',', ':')) + "\n"
+            else:
+                yield json.dumps({"index": i, "result": project(result, fields)}, separators=(',', ':')) + "\n"
+
+    response = Response(stream(), mimetype='application/x-ndjson')
+    response.call_on_close(lambda: slot.__exit__(None, None, None))
+    return response
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    # Job mode: returns immediately, the pipeline runs on a background executor
+    data = request.json or {}
+    idea_text = data.get('idea')
+
+    if not idea_text:
+        return jsonify({"error": "No idea provided"}), 400
+
+    simulation_runs, tolerance, error = parse_sampling(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        job_id = jobs.submit(idea_text, simulation_runs, parse_deterministic(data), tolerance)
+    except Overloaded as e:
+        return overloaded_response(e)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # Polling endpoint; pass ?since=<next_cursor> to receive only new stage events
+    # and ?fields=a,b.c to project the result as in /api/simulate
+    since = request.args.get('since', 0, type=int)
+    fields, error = parse_fields(request.args.get('fields'))
+    if error:
+        return jsonify({"error": error}), 400
+    snap = jobs.snapshot(job_id, since)
+    if snap is None:
+        return jsonify({"error": "Job not found"}), 404
+    if snap.get("result") is not None:
+        snap["result"] = project(snap["result"], fields)
+    return jsonify(snap)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    # Server-Sent Events: one `stage` event per finished stage, then `done` or `error`
+    if not jobs.exists(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    # The slot is held while the stream is open, not just while this view runs
+    slot = admission.slot("streams")
+    try:
+        slot.__enter__()
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    def stream():
+        cursor = 0
+        while True:
+            events, status = jobs.wait_for_events(job_id, cursor)
+            if events is None:
+                return
+            for ev in events:
+                yield f"event: stage\ndata: {json.dumps(ev)}\n\n"
+            cursor += len(events)
+            if status in ("done", "error"):
+                yield f"event: {status}\ndata: {json.dumps({'job_id': job_id, 'status': status})}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: slot.__exit__(None, None, None))
+    return response
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"memo": engine.memo.stats(), "stages": engine.stages.cache.stats(), "reports": engine.report_store.stats(),
+                    "admission": admission.stats(), "jobs": jobs.stats()})
+
+@app.route('/api/run-log', methods=['GET'])
+@admitted("expensive")
+def run_log_stats():
+    # Aggregates over every logged run, e.g. /api/run-log?by=domain&bins=20&income_level=Aspirers&since=1760000000
+    if engine.run_log is None:
+        return jsonify({"error": "Run log is disabled"}), 404
+    args = request.args
+    filters = {k: v for k, v in args.items() if k not in ('by', 'bins', 'since')}
+    try:
+        since = float(args['since']) if 'since' in args else None
+        by = args.get('by', 'domain')
+        return jsonify({
+            "by": by,
+            "blocker_distribution": engine.run_log.blocker_distribution(by, filters, since),
+            "capture_histogram": engine.run_log.capture_histogram(args.get('bins', 10), filters, since),
+            "log": engine.run_log.stats()
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(METRICS.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+def profiler():
+    if request.method == 'POST':
+        # Changing settings needs ADMIN_TOKEN to be configured and presented
+        admin_token = os.environ.get('ADMIN_TOKEN')
+        if not admin_token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({"error": "Forbidden"}), 403
+        data = request.json or {}
+        try:
+            sample_rate = float(data.get('sample_rate', 1.0))
+            interval_ms = float(data.get('interval_ms', 5))
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_rate and interval_ms must be numbers"}), 400
+        if not 0 <= sample_rate <= 1 or interval_ms < 1:
+            return jsonify({"error": "sample_rate must be in [0, 1] and interval_ms at least 1"}), 400
+        PROFILER.configure(bool(data.get('enabled')), sample_rate, interval_ms)
+    return jsonify({"settings": PROFILER.current_settings(), "profiles": PROFILER.list_profiles()})
+
 @app.route('/api/download-report', methods=['POST'])
+@admitted("cheap")
 def download_report():
     data = request.json
     report_id = data.get('report_id')
     
-    # Get path from engine cache
-    filepath = engine.get_report_path(report_id)
+    # Rendered in memory on first download, then served from the shared report store
+    pdf = engine.get_report_pdf(report_id)
     
-    if not filepath or not os.path.exists(filepath):
+    if pdf is None:
         return jsonify({"error": "Report not found"}), 404
 
-    filename = os.path.basename(filepath)
-    return send_file(filepath, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    filepath, data = pdf
+    filename = f"Report_{report_id}.pdf"
+    if data is None:
+        return send_file(filepath, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return send_file(io.BytesIO(data), as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+MAX_PORTFOLIO_IDEAS = 500
+
+@app.route('/api/portfolio-report', methods=['POST'])
+@admitted("expensive")
+def portfolio_report():
+    # {"report_ids": [...]} from earlier simulations, or {"ideas": [...]} to simulate first;
+    # returns one PDF with a comparative ranking and every idea's report
+    data = request.json or {}
+    report_ids, ideas = data.get('report_ids'), data.get('ideas')
+    items = report_ids if report_ids is not None else ideas
+    if (report_ids is None) == (ideas is None):
+        return jsonify({"error": "Provide either report_ids or ideas"}), 400
+    if not isinstance(items, list) or not items or not all(isinstance(i, str) and i for i in items):
+        return jsonify({"error": "report_ids or ideas must be a non-empty list of strings"}), 400
+    if len(items) > MAX_PORTFOLIO_IDEAS:
+        return jsonify({"error": f"At most {MAX_PORTFOLIO_IDEAS} ideas per portfolio"}), 400
+
+    simulation_runs, error = parse_simulation_runs(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    workers = os.environ.get('PORTFOLIO_WORKERS')
+    # A portfolio can run to hundreds of megabytes: it goes to an anonymous temp file that
+    # send_file streams from and that disappears when the response closes it
+    pdf = tempfile.TemporaryFile()
+    try:
+        engine.get_portfolio_pdf(pdf, report_ids, ideas, simulation_runs, parse_deterministic(data),
+                                 workers=int(workers) if workers else None)
+    except KeyError as e:
+        pdf.close()
+        return jsonify({"error": f"Reports not found: {e.args[0]}"}), 404
+    except Exception as e:
+        pdf.close()
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    pdf.seek(0)
+    return send_file(pdf, as_attachment=True, download_name="Portfolio_Report.pdf",
+                     mimetype='application/pdf')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,165 @@
+"""Micro-benchmark: PDF report rendering, legacy path vs the cached in-memory path.
+
+The legacy path rebuilds every style and flowable, writes the PDF to /tmp
+and reads it back, as send_file did. The new path renders with
+pdf_report_generator.render_pdf. Both run in a single thread, so the
+numbers are reports per second per core.
+
+    python benchmarks/bench_pdf_render.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('REPORT_STORE_DIR', tempfile.mkdtemp(prefix='idea_sim_bench_'))
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='idea_sim_bench_metrics_'))
+os.environ['RUN_LOG_PATH'] = ''
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from app import INDUSTRY_IDEAS
+from pdf_report_generator import generate_600_word_analysis, render_pdf
+from simulation_engine import SimulationEngine
+
+ROUNDS = 5
+
+# generate_detailed_pdf before styles and static flowables were cached
+def legacy_generate_detailed_pdf(sim_data, filename):
+    doc = SimpleDocTemplate(filename, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    
+    # Custom Styles
+    title_style = ParagraphStyle('TitleCustom', parent=styles['Title'], fontSize=22, alignment=1, spaceAfter=20)
+    h1 = ParagraphStyle('H1Custom', parent=styles['Heading1'], fontSize=16, spaceBefore=15, spaceAfter=10, textColor=colors.darkblue)
+    normal = ParagraphStyle('NormalCustom', parent=styles['BodyText'], fontSize=10, leading=14, alignment=4) # Justify
+    
+    # 1. COVER PAGE
+    story.append(Spacer(1, 1*inch))
+    story.append(Paragraph("IDEA SIMULATION ENGINE", title_style))
+    story.append(Paragraph("COMPREHENSIVE ANALYSIS REPORT", ParagraphStyle('Sub', parent=title_style, fontSize=16)))
+    story.append(Spacer(1, 1*inch))
+    story.append(Paragraph(f"<b>Idea:</b> {sim_data['idea_title']}", styles['Heading2']))
+    story.append(Paragraph(f"<b>Date:</b> {sim_data['date']}", styles['Normal']))
+    story.append(Paragraph(f"<b>Report ID:</b> {sim_data['report_id']}", styles['Normal']))
+    story.append(PageBreak())
+    
+    # 2. METHODOLOGY
+    story.append(Paragraph("RESEARCH METHODOLOGY", h1))
+    story.append(Paragraph("This analysis was conducted using a deterministic simulation models grounded in Indian demographic data benchmarks:", normal))
+    story.append(Spacer(1, 0.2*inch))
+    
+    methods = [
+        f"• <b>Market Size:</b> Derived from census data segments, totaling {sim_data['tam']:,} addressable users.",
+        f"• <b>Pricing Logic:</b> Benchmarked against {sim_data['domain']} standards adjusted for {sim_data['income_level']} income caps.",
+        f"• <b>Adoption Modeling:</b> Uses conservative conversion rates (0.05%-0.2%) affected by a calculated Friction Score of {sim_data['friction_score']}/100.",
+        f"• <b>Risk Simulation:</b> {sim_data.get('simulation_runs', 1000):,} Monte Carlo iterations run to identify the primary failure point: {sim_data['primary_blocker']}.",
+        f"• <b>Financial Sanity:</b> All revenue projections are auto-corrected for 'unicorn' inflation to ensure realism."
+    ]
+    for m in methods:
+        story.append(Paragraph(m, normal))
+        story.append(Spacer(1, 6))
+    
+    # 3. DETAILED FINDINGS
+    story.append(PageBreak())
+    story.append(Paragraph("DETAILED ANALYSIS FINDINGS", h1))
+    analysis_text = generate_600_word_analysis(sim_data)
+    story.append(Paragraph(analysis_text, normal))
+    
+    # 4. COMPETITOR WEAKNESS ANALYSIS (Replaces Financials)
+    story.append(PageBreak())
+    story.append(Paragraph("COMPETITOR WEAKNESS MAP", h1))
+    
+    story.append(Paragraph(f"<b>Primary Attack Vector: {sim_data['market_gap']}</b>", styles['Heading2']))
+    story.append(Paragraph(f"Capture Potential: {sim_data['capture_potential']}% of competitor market share.", normal))
+    story.append(Spacer(1, 10))
+    
+    # Competitor Table
+    comp_data = [['Competitor', 'Weakness Score', 'Primary Weakness', 'Exploitability']]
+    for c in sim_data['competitors']:
+        comp_data.append([
+            c['name'],
+            f"{c['weakness_score']}/10",
+            c['primary_weakness'].title(),
+            f"{c['exploitability']}"
+        ])
+    
+    t = Table(comp_data, colWidths=[120, 80, 100, 80])
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.darkgreen),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('PADDING', (0,0), (-1,-1), 8),
+        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 15))
+    story.append(Paragraph("Strategic Recommendation:", styles['Heading2']))
+    story.append(Paragraph(f"To exploit the identified gap in <b>{sim_data['attack_vector']}</b>, we recommend positioning the product specifically against the weaknesses of {sim_data['competitors'][0]['name']}. Their vulnerability in {sim_data['competitors'][0]['primary_weakness']} offers the highest ROI entry point.", normal))
+    story.append(Spacer(1, 20))
+    
+    # 5. RISK & ACTION
+    story.append(Paragraph("RISK ANALYSIS & ACTION PLAN", h1))
+    
+    story.append(Paragraph(f"<b>Primary Risk:</b> {sim_data['top_risk']}", styles['Heading2']))
+    story.append(Paragraph(f"Severity: {sim_data['top_risk_severity']}/10 | Impact: {sim_data['blocker_impact_pct']}% of funnel.", normal))
+    story.append(Paragraph(f"<i>Mitigation: {sim_data['mitigation']}</i>", normal))
+    story.append(Spacer(1, 10))
+    
+    story.append(Paragraph("Recommended Actions", styles['Heading2']))
+    story.append(Paragraph(f"<b>1. Immediate (2 Weeks):</b> {sim_data['urgent_action']['description']}", normal))
+    story.append(Paragraph(f"   (Cost: INR {sim_data['urgent_action']['cost_inr']:,})", normal))
+    story.append(Spacer(1, 5))
+    story.append(Paragraph(f"<b>2. Next Step (3 Months):</b> {sim_data['next_step']['description']}", normal))
+    story.append(Paragraph(f"   (Cost: INR {sim_data['next_step']['cost_inr']:,})", normal))
+
+    doc.build(story)
+    return filename
+
+def legacy_render(sim_data):
+    # Render to a temp file, then read it back for the response
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        legacy_generate_detailed_pdf(sim_data, path)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def reports_per_second(render, reports):
+    # Best pass over the corpus, to keep scheduler noise out of the comparison
+    start = time.perf_counter()
+    for sim_data in reports:
+        render(sim_data)
+    return len(reports) / (time.perf_counter() - start)
+
+def main():
+    engine = SimulationEngine(use_nlp=False)
+    texts = [idea for ideas in INDUSTRY_IDEAS.values() for idea in ideas]
+    reports = [engine.run_simulation(t, deterministic=True)['sim_data_flat'] for t in texts]
+
+    # Byte-identical output when timestamps and document ids are pinned
+    rl_config.invariant = 1
+    for sim_data in reports:
+        assert legacy_render(sim_data) == render_pdf(sim_data), sim_data['idea_title']
+    rl_config.invariant = 0
+
+    legacy = cached = 0.0
+    for _ in range(ROUNDS):
+        legacy = max(legacy, reports_per_second(legacy_render, reports))
+        cached = max(cached, reports_per_second(render_pdf, reports))
+    print(f"{'path':<8} {'reports/s/core':>15}")
+    print(f"{'legacy':<8} {legacy:>15.1f}")
+    print(f"{'cached':<8} {cached:>15.1f}")
+    print(f"speedup  {cached / legacy:>14.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark: run log append cost and aggregate query time at scale.
+
+Appends a few thousand real simulation results through RunLog.append (the
+per-request cost), then bulk-loads synthetic rows drawn from those results
+until the log holds --rows rows, and times the blocker-distribution and
+capture-potential-histogram queries over all of it.
+
+    python benchmarks/bench_run_log.py
+    python benchmarks/bench_run_log.py --rows 5000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('REPORT_STORE_DIR', tempfile.mkdtemp(prefix='idea_sim_bench_'))
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='idea_sim_bench_metrics_'))
+os.environ['RUN_LOG_PATH'] = ''
+from app import INDUSTRY_IDEAS
+from run_log import RunLog, INSERT
+from simulation_engine import SimulationEngine
+
+SEED_RUNS = 2000
+LOAD_CHUNK = 100000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="rows in the log before querying")
+    args = parser.parse_args()
+
+    engine = SimulationEngine(use_nlp=False, deterministic=False)
+    ideas = [idea for group in INDUSTRY_IDEAS.values() for idea in group]
+    results = [engine.run_simulation(ideas[i % len(ideas)])['sim_data_flat'] for i in range(SEED_RUNS)]
+
+    with tempfile.TemporaryDirectory(prefix='idea_sim_run_log_') as scratch:
+        log = RunLog(os.path.join(scratch, 'runs.sqlite3'))
+        timings = {"stage3_env_calc": 0.0001, "stage4_collision": 0.0004}
+        start = time.perf_counter()
+        for sim_data in results:
+            log.append(sim_data, timings)
+        append_us = (time.perf_counter() - start) / len(results) * 1e6
+        log.flush()
+
+        # Synthetic bulk: real rows with the domain, blocker and capture potential reshuffled
+        rng = random.Random(0)
+        template = log.frame().values.tolist()
+        columns = list(log.frame(limit=1).columns)
+        shuffled = {c: [row[columns.index(c)] for row in template]
+                    for c in ("domain", "primary_blocker", "capture_potential", "income_level")}
+        conn = log._conn()
+        start = time.perf_counter()
+        remaining = args.rows - len(template)
+        while remaining > 0:
+            chunk = []
+            for _ in range(min(LOAD_CHUNK, remaining)):
+                row = list(rng.choice(template))
+                for c, values in shuffled.items():
+                    row[columns.index(c)] = rng.choice(values)
+                chunk.append(row)
+            conn.execute("BEGIN")
+            conn.executemany(INSERT, chunk)
+            conn.execute("COMMIT")
+            remaining -= len(chunk)
+        load_s = time.perf_counter() - start
+        rows = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        domain = shuffled["domain"][0]
+
+        print(f"append (request path):      {append_us:8.1f} us/run")
+        print(f"bulk load:                  {rows / load_s:8.0f} rows/s ({rows} rows)")
+        for label, query in [
+            ("blocker distribution/domain", lambda: log.blocker_distribution("domain")),
+            ("blocker distribution/income", lambda: log.blocker_distribution("income_level")),
+            ("capture histogram (20 bins)", lambda: log.capture_histogram(20)),
+            ("capture histogram, 1 domain", lambda: log.capture_histogram(20, {"domain": domain})),
+        ]:
+            start = time.perf_counter()
+            query()
+            print(f"{label:<28} {time.perf_counter() - start:8.3f} s")
+
+if __name__ == '__main__':
+    main()
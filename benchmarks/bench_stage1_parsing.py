@@ -0,0 +1,79 @@
+"""Micro-benchmark: keyword extraction in stage1_parsing, legacy scan vs KeywordIndex.
+
+Runs the regex-fallback path (no spaCy) so only keyword matching is timed.
+The persona library is padded with synthetic entries to show how each
+approach scales with vocabulary size.
+
+    python benchmarks/bench_stage1_parsing.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app import INDUSTRY_IDEAS
+from keyword_index import KeywordIndex
+from simulation_engine import SimulationEngine, TARGET_KEYWORDS, DOMAIN_KEYWORDS, B2B_KEYWORDS
+
+def legacy_keywords(personas, text):
+    # Keyword part of stage1_parsing before the single-pass index
+    target_user = None
+    for p in personas:
+        if p['name'].split()[0].lower() in text.lower() or p['type'].lower() in text.lower():
+            target_user = p['type']
+            break
+    if target_user is None:
+        if "student" in text.lower(): target_user = "Student"
+        elif "business" in text.lower() or "sme" in text.lower(): target_user = "Small Business Owner"
+        elif "farmer" in text.lower(): target_user = "Farmer"
+        elif "doctor" in text.lower(): target_user = "Doctor"
+    is_b2b = "enterprise" in text.lower()
+    domain = None
+    if "food" in text.lower(): domain = "Food & Hospitality"
+    elif "health" in text.lower(): domain = "Health & Wellness"
+    elif "shop" in text.lower() or "retail" in text.lower(): domain = "E-commerce & Retail"
+    elif "finance" in text.lower(): domain = "FinTech"
+    elif "education" in text.lower() or "learn" in text.lower(): domain = "EdTech"
+    return target_user, is_b2b, domain
+
+def synthetic_personas(base, count, rng):
+    personas = list(base)
+    while len(personas) < count:
+        name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 9)))
+        personas.append({"name": f"{name.title()} (Synthetic)", "type": f"{name} segment"})
+    return personas
+
+def build_index(personas):
+    persona_keywords = []
+    for p in personas:
+        persona_keywords.append((p['name'].split()[0], p['type']))
+        persona_keywords.append((p['type'], p['type']))
+    return KeywordIndex({"persona": persona_keywords, "target": TARGET_KEYWORDS,
+                         "domain": DOMAIN_KEYWORDS, "b2b": B2B_KEYWORDS})
+
+def main():
+    engine = SimulationEngine(use_nlp=False)
+    texts = [idea for ideas in INDUSTRY_IDEAS.values() for idea in ideas]
+    rng = random.Random(7)
+
+    print(f"{'personas':>9} {'legacy us/idea':>15} {'index us/idea':>14} {'speedup':>8}")
+    for size in (len(engine.personas), 150, 1500):
+        personas = synthetic_personas(engine.personas, size, rng)
+        index = build_index(personas)
+
+        # Same answers as the legacy scan
+        for text in texts:
+            found = index.scan(text)
+            target = found.get("persona", found.get("target"))
+            assert (target, "b2b" in found, found.get("domain")) == legacy_keywords(personas, text), text
+
+        n = 200
+        legacy = timeit.timeit(lambda: [legacy_keywords(personas, t) for t in texts], number=n)
+        indexed = timeit.timeit(lambda: [index.scan(t) for t in texts], number=n)
+        per_idea = 1e6 / (n * len(texts))
+        print(f"{size:>9} {legacy * per_idea:>15.1f} {indexed * per_idea:>14.1f} {legacy / indexed:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
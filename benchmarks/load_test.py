@@ -0,0 +1,219 @@
+"""Load test: throughput and tail latency of app:app under gunicorn settings.
+
+For each workers x threads configuration it starts gunicorn locally (with
+gunicorn.conf.py), then replays a weighted request mix at each concurrency
+level for a fixed time. The mix covers simulate, download-report,
+industry-ideas and the home page. Idea texts come from corpus.json. Each
+closed-loop client keeps one connection open and sends its next request as
+soon as the previous one answers. Reports go to a throwaway store, and
+nothing outside this machine is contacted.
+
+Reported per configuration and concurrency: requests/s, simulations/s,
+p50/p95/p99 latency (overall and per request type), the error rate and the
+share of requests shed with 429.
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --configs 1x8,2x4 --concurrency 1,8,32 --duration 20 --json load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, HERE)
+from startup_report import free_port
+
+DEFAULT_MIX = "simulate=5,download=2,ideas=2,home=1"
+INDUSTRIES = ["tech", "retail", "health", "food"]
+
+def load_ideas():
+    # The committed benchmark corpus (INDUSTRY_IDEAS plus request titles and bodies)
+    with open(os.path.join(HERE, 'corpus.json')) as f:
+        return json.load(f)
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"simulate", "download", "ideas", "home"}
+    if unknown:
+        raise SystemExit(f"unknown request types in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+class Client:
+    # One keep-alive connection; reconnects after errors
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {"Accept-Encoding": "gzip"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            return None, b''
+
+class Run:
+    def __init__(self, port, mix, ideas, fresh):
+        self.port = port
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.ideas = ideas
+        self.fresh = fresh
+        self.report_ids = []
+        self.lock = threading.Lock()
+        self.samples = []  # (kind, seconds, status)
+
+    def one(self, client, rng):
+        kind = rng.choices(self.kinds, self.weights)[0]
+        if kind == "download" and not self.report_ids:
+            kind = "simulate"
+        start = time.perf_counter()
+        if kind == "simulate":
+            body = {"idea": rng.choice(self.ideas)}
+            if self.fresh:
+                body["deterministic"] = False
+            status, data = client.request("POST", "/api/simulate", body)
+            if status == 200:
+                report_id = json.loads(data).get("report_id")
+                with self.lock:
+                    self.report_ids.append(report_id)
+                    del self.report_ids[:-200]
+        elif kind == "download":
+            with self.lock:
+                report_id = rng.choice(self.report_ids)
+            status, _ = client.request("POST", "/api/download-report", {"report_id": report_id})
+        elif kind == "ideas":
+            status, _ = client.request("GET", f"/api/industry-ideas/{rng.choice(INDUSTRIES)}")
+        else:
+            status, _ = client.request("GET", "/")
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples.append((kind, elapsed, status))
+
+    def level(self, concurrency, duration):
+        self.samples = []
+        stop = time.perf_counter() + duration
+
+        def worker(seed):
+            client = Client(self.port)
+            rng = random.Random(seed)
+            while time.perf_counter() < stop:
+                self.one(client, rng)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return summarize(self.samples, time.perf_counter() - started)
+
+def summarize(samples, wall):
+    def stats(rows):
+        latencies = sorted(s for _, s, _ in rows)
+        return {
+            "requests": len(rows),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        }
+    ok = [r for r in samples if r[2] in (200, 304)]
+    shed = [r for r in samples if r[2] == 429]
+    summary = stats(ok)
+    summary.update({
+        "wall_s": round(wall, 2),
+        "rps": round(len(ok) / wall, 1),
+        "simulations_per_s": round(sum(1 for k, _, _ in ok if k == "simulate") / wall, 1),
+        "error_rate": round((len(samples) - len(ok) - len(shed)) / len(samples), 4) if samples else 0.0,
+        "shed_rate": round(len(shed) / len(samples), 4) if samples else 0.0,
+        "errors": dict(Counter(f"{k} {status or 'connection error'}" for k, _, status in samples
+                               if status not in (200, 304, 429))),
+        "by_kind": {kind: stats([r for r in ok if r[0] == kind]) for kind in sorted({r[0] for r in samples})},
+    })
+    return summary
+
+def start_gunicorn(workers, threads, port, scratch, timeout=120):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               REPORT_STORE_DIR=os.path.join(scratch, 'reports'), JOB_STORE_DIR=os.path.join(scratch, 'jobs'),
+               METRICS_DIR=os.path.join(scratch, 'metrics'), RUN_LOG_PATH=os.path.join(scratch, 'runs.sqlite3'))
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "app:app"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = Client(port)
+    started = time.perf_counter()
+    while client.request("GET", "/")[0] != 200:
+        if proc.poll() is not None or time.perf_counter() - started > timeout:
+            proc.kill()
+            raise RuntimeError(f"gunicorn ({workers}x{threads}) did not come up")
+        time.sleep(0.1)
+    return proc
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default="1x8,2x4,4x2", help="comma-separated WORKERSxTHREADS")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="request weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--memo", action="store_true", help="allow memoized simulate results (default: fresh runs)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    ideas = load_ideas()
+    levels = [int(c) for c in args.concurrency.split(',')]
+    results = []
+    print(f"{'config':<7} {'clients':>7} {'req/s':>8} {'sims/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'shed':>7}")
+    for config in args.configs.split(','):
+        workers, threads = (int(x) for x in config.lower().split('x'))
+        port = free_port()
+        with tempfile.TemporaryDirectory(prefix='idea_sim_load_') as scratch:
+            proc = start_gunicorn(workers, threads, port, scratch)
+            try:
+                run = Run(port, mix, ideas, fresh=not args.memo)
+                if args.warmup > 0:
+                    run.level(min(levels), args.warmup)
+                for concurrency in levels:
+                    summary = run.level(concurrency, args.duration)
+                    summary.update({"config": config, "workers": workers, "threads": threads, "concurrency": concurrency})
+                    results.append(summary)
+                    print(f"{config:<7} {concurrency:>7} {summary['rps']:>8} {summary['simulations_per_s']:>7} "
+                          f"{summary['p50_ms']!s:>8} {summary['p95_ms']!s:>8} {summary['p99_ms']!s:>8} "
+                          f"{summary['error_rate']:>7.2%} {summary['shed_rate']:>7.2%}")
+            finally:
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=30)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"mix": mix, "duration_s": args.duration, "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
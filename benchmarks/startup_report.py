@@ -0,0 +1,101 @@
+"""Startup report: cold-start time and per-worker memory under gunicorn.
+
+Compares the old startup (full spaCy pipeline, every worker imports the app
+itself) with the current one (NER excluded, app preloaded in the master via
+gunicorn.conf.py). For each mode it starts gunicorn, waits until the home
+page answers, and reads RSS/PSS of every worker from /proc (Linux only).
+PSS splits shared pages between the processes sharing them, so it shows
+what copy-on-write sharing saves.
+
+    python benchmarks/startup_report.py [--workers 4] [--json out.json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODES = {
+    # -c /dev/null skips gunicorn.conf.py, i.e. no preload
+    "before": {"args": ["-c", "/dev/null", "--worker-class", "gthread", "--threads", "8"], "env": {"SPACY_EXCLUDE": ""}},
+    "after": {"args": [], "env": {}},
+}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def memory_kb(pid):
+    # {"rss": kB, "pss": kB} from smaps_rollup
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ("Rss", "Pss"):
+                out[key.lower()] = int(rest.split()[0])
+    return out
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+def measure(mode, workers, timeout=120):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), **MODES[mode]["env"])
+    cmd = [sys.executable, "-m", "gunicorn", *MODES[mode]["args"], "--workers", str(workers),
+           "--bind", f"127.0.0.1:{port}", "app:app"]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"{mode}: gunicorn did not come up within {timeout}s")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+        cold_start = time.perf_counter() - started
+
+        # Wait for every worker to finish booting before sampling memory
+        deadline = time.perf_counter() + timeout
+        while len(child_pids(proc.pid)) < workers and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        time.sleep(1.0)
+        per_worker = [memory_kb(pid) for pid in child_pids(proc.pid)]
+        return {
+            "mode": mode,
+            "workers": workers,
+            "cold_start_s": round(cold_start, 3),
+            "master": memory_kb(proc.pid),
+            "per_worker": per_worker,
+            "worker_rss_mb_avg": round(sum(w["rss"] for w in per_worker) / len(per_worker) / 1024, 1),
+            "worker_pss_mb_avg": round(sum(w["pss"] for w in per_worker) / len(per_worker) / 1024, 1),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = [measure(mode, args.workers) for mode in MODES]
+    print(f"{'mode':<8} {'cold start s':>12} {'worker RSS MB':>14} {'worker PSS MB':>14}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['cold_start_s']:>12} {r['worker_rss_mb_avg']:>14} {r['worker_pss_mb_avg']:>14}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
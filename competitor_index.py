@@ -0,0 +1,64 @@
+import numpy as np
+from kb_snapshot import WEAKNESS_KEYS
+
+# Competitor weakness scores compiled once per knowledge base load into one
+# matrix per domain (rows: competitors, columns: WEAKNESS_KEYS), so
+# analyze_competitors scores the whole domain with a few array operations
+# and keeps only the most exploitable ones.
+TOP_K = 3
+# A weakness scoring above this is one the target persona can exploit
+EXPLOIT_THRESHOLD = 6
+
+# Extra impact per weakness column when the target user contains the key and
+# the competitor's score in that column is above EXPLOIT_THRESHOLD.
+# Price-sensitive students make pricing weaknesses count 1.5x.
+IMPACT_WEIGHTS = {
+    "Student": [0.5, 0.0, 0.0, 0.0],
+}
+
+class DomainCompetitors:
+    def __init__(self, competitors):
+        self.competitors = competitors
+        self.scores = np.array([[c['weaknesses'][key]['score'] for key in WEAKNESS_KEYS] for c in competitors],
+                               dtype=np.float64).reshape(len(competitors), len(WEAKNESS_KEYS))
+        self.avg_weakness = self.scores.mean(axis=1)
+        # First column wins ties, as in WEAKNESS_KEYS order
+        self.primary = self.scores.argmax(axis=1)
+        self.exploitable = (self.scores > EXPLOIT_THRESHOLD).astype(np.float64)
+        self.names = [WEAKNESS_KEYS[i] for i in self.primary]
+        self.avg_list = self.avg_weakness.tolist()
+
+    def top_exploitable(self, impact_weights, k=TOP_K):
+        # Returns [(competitor, avg_weakness, exploitability, primary_weakness)], most exploitable first
+        impact = 1.0 + self.exploitable @ impact_weights
+        exploitability = self.avg_weakness * impact
+        n = len(self.competitors)
+        if n > k:
+            chosen = np.sort(np.argpartition(-exploitability, k - 1)[:k])
+            values = exploitability[chosen]
+        else:
+            chosen = np.arange(n)
+            values = exploitability
+        # Highest exploitability first, library order among equals
+        order = np.argsort(-values, kind='stable')
+        return [(self.competitors[i], self.avg_list[i], v, self.names[i])
+                for i, v in zip(chosen[order].tolist(), values[order].tolist())]
+
+class CompetitorIndex:
+    def __init__(self, competitors_db):
+        self.domains = {domain: DomainCompetitors(entries) for domain, entries in competitors_db.items() if entries}
+        self.weights_cache = {}
+
+    def get(self, domain):
+        return self.domains.get(domain)
+
+    def impact_weights(self, target_user):
+        weights = self.weights_cache.get(target_user)
+        if weights is None:
+            weights = np.zeros(len(WEAKNESS_KEYS))
+            for key, extra in IMPACT_WEIGHTS.items():
+                if key in target_user:
+                    weights += extra
+            if len(self.weights_cache) < 1024:
+                self.weights_cache[target_user] = weights
+        return weights
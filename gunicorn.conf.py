@@ -0,0 +1,19 @@
+import gc
+import os
+from metrics import METRICS
+
+# Load app.py (and the spaCy model / knowledge base) once in the master so
+# forked workers share those pages copy-on-write instead of each loading them.
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+def on_starting(server):
+    # Drop histograms left behind by workers of a previous run
+    METRICS.reset()
+
+def when_ready(server):
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # workers don't write to (and un-share) those pages.
+    gc.freeze()
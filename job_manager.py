@@ -0,0 +1,205 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from simulation_engine import PIPELINE_STAGES
+from admission import Overloaded, SERVICE_TIME_ALPHA
+
+# Background simulation jobs: POST returns a job id, stages run on a bounded
+# executor and clients follow progress through polling or SSE.
+# Submissions beyond max_workers running plus max_queue waiting are refused.
+# Job status, stage events and results live in a SQLite database (WAL mode)
+# shared by every worker, as in ReportStore, so any worker can answer a poll
+# or stream for a job another worker is running.
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_JOB_QUEUE = 64
+DEFAULT_JOB_DIR = os.path.join('/tmp', 'idea_sim_jobs')
+JOB_TTL_SECONDS = 600
+# Jobs never finished after this long belong to a worker that died
+ORPHAN_SECONDS = 3600
+# How often a stream checks for events written by another worker
+POLL_INTERVAL = 0.2
+INDEX_NAME = 'jobs.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+class JobManager:
+    def __init__(self, engine, max_workers=DEFAULT_JOB_WORKERS, ttl_seconds=JOB_TTL_SECONDS, max_queue=DEFAULT_JOB_QUEUE,
+                 directory=DEFAULT_JOB_DIR):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim-job")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, INDEX_NAME)
+        self.local = threading.local()
+        # Wakes streams in this process early; streams for jobs in other workers poll
+        self.cond = threading.Condition()
+        self.pending = 0
+        self.service_time = 1.0
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread and per process, as in ReportStore
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def submit(self, idea_text, simulation_runs, deterministic=None, tolerance=None):
+        job_id = uuid.uuid4().hex
+        with self.cond:
+            if self.pending >= self.max_workers + self.max_queue:
+                # Time for the jobs ahead to drain through the workers
+                waiting = self.pending - self.max_workers + 1
+                raise Overloaded("jobs", max(1, math.ceil(waiting * self.service_time / self.max_workers)), "queue full")
+            self.pending += 1
+        try:
+            self._evict_expired()
+            self._conn().execute("INSERT INTO jobs (job_id, status, created) VALUES (?, 'queued', ?)",
+                                 (job_id, time.time()))
+        except sqlite3.Error:
+            with self.cond:
+                self.pending -= 1
+            raise
+        self.executor.submit(self._run, job_id, idea_text, simulation_runs, deterministic, tolerance)
+        return job_id
+
+    def _run(self, job_id, idea_text, simulation_runs, deterministic, tolerance):
+        started = time.perf_counter()
+        # Whatever fails, the job must leave `pending` and end up finished, or its
+        # streams would wait on it forever
+        try:
+            conn = self._conn()
+            seq = 0
+
+            def progress(stage):
+                nonlocal seq
+                event = {
+                    "stage": stage,
+                    "index": PIPELINE_STAGES.index(stage) + 1,
+                    "total": len(PIPELINE_STAGES),
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+                }
+                conn.execute("INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)", (job_id, seq, json.dumps(event)))
+                seq += 1
+                self._notify()
+
+            conn.execute("UPDATE jobs SET status = 'running' WHERE job_id = ?", (job_id,))
+            self._notify()
+            result = self.engine.run_simulation(idea_text, simulation_runs, progress=progress,
+                                                deterministic=deterministic, tolerance=tolerance)
+            conn.execute("UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE job_id = ?",
+                         (json.dumps(result), time.time(), job_id))
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                self._conn().execute("UPDATE jobs SET status = 'error', error = ?, finished = ? WHERE job_id = ?",
+                                     (str(e), time.time(), job_id))
+            except sqlite3.Error:
+                traceback.print_exc()
+        finally:
+            with self.cond:
+                self.pending -= 1
+                self.service_time += SERVICE_TIME_ALPHA * (time.perf_counter() - started - self.service_time)
+                self.cond.notify_all()
+
+    def _notify(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {"pending": self.pending, "max_workers": self.max_workers, "max_queue": self.max_queue,
+                    "service_time_s": round(self.service_time, 4)}
+
+    def _evict_expired(self):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            doomed = "SELECT job_id FROM jobs WHERE finished < ? OR (finished IS NULL AND created < ?)"
+            params = (now - self.ttl_seconds, now - ORPHAN_SECONDS)
+            conn.execute(f"DELETE FROM job_events WHERE job_id IN ({doomed})", params)
+            conn.execute(f"DELETE FROM jobs WHERE job_id IN ({doomed})", params)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read(self, job_id, since, with_result=False):
+        # (status, events past `since`, total events, result, error), or None for an unknown job.
+        # Status is read first: events are all written before a job is marked finished.
+        conn = self._conn()
+        row = conn.execute(f"SELECT status, {'result' if with_result else 'NULL'}, error FROM jobs WHERE job_id = ?",
+                           (job_id,)).fetchone()
+        if row is None:
+            return None
+        events = [json.loads(e) for (e,) in conn.execute(
+            "SELECT event FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, since))]
+        total = since + len(events) if events else conn.execute(
+            "SELECT COUNT(*) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        return row[0], events, total, row[1], row[2]
+
+    def snapshot(self, job_id, since=0):
+        state = self._read(job_id, since, with_result=True)
+        if state is None:
+            return None
+        status, events, total, result, error = state
+        snap = {
+            "job_id": job_id,
+            "status": status,
+            "events": events,
+            "next_cursor": total
+        }
+        if status == "done":
+            snap["result"] = json.loads(result)
+        elif status == "error":
+            snap["error"] = error
+        return snap
+
+    def exists(self, job_id):
+        return self._conn().execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def wait_for_events(self, job_id, cursor, timeout=15):
+        # Blocks until there are events past `cursor`, the job finishes or `timeout` passes.
+        # Returns (new_events, status), or (None, None) if the job is unknown.
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self._read(job_id, cursor)
+            if state is None:
+                return None, None
+            status, events = state[0], state[1]
+            if events or status in ("done", "error"):
+                return events, status
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], status
+            with self.cond:
+                self.cond.wait(min(remaining, POLL_INTERVAL))
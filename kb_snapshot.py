@@ -0,0 +1,156 @@
+"""Compile the data/*.json knowledge base into one validated binary snapshot.
+
+The snapshot is a small header followed by a marshal payload. Workers
+memory-map it read-only, so the file's pages sit once in the OS page
+cache no matter how many workers read it. The engine watches the file
+and swaps a new build in without a restart.
+
+    python kb_snapshot.py build [--data-dir data] [--out data/knowledge_base.snapshot]
+    python kb_snapshot.py check [--snapshot data/knowledge_base.snapshot]
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+# Engine attribute -> source file in data/
+KB_FILES = {
+    "demographics": "indian_demographics.json",
+    "benchmarks": "industry_benchmarks.json",
+    "infrastructure": "infrastructure_readiness.json",
+    "personas": "persona_library.json",
+    "solutions": "solution_templates.json",
+    "income_caps": "income_spend_caps.json",
+    "competitors_db": "competitor_database.json",
+}
+
+SNAPSHOT_NAME = "knowledge_base.snapshot"
+MAGIC = b"IDEAKB01"
+# magic, python major, python minor, marshal version, sha256 of payload
+HEADER = struct.Struct("<8sBBB32s")
+WEAKNESS_KEYS = ("pricing", "features", "ux", "coverage")
+
+def load_json_sources(data_dir):
+    data = {}
+    for attr, filename in KB_FILES.items():
+        with open(os.path.join(data_dir, filename)) as f:
+            data[attr] = json.load(f)
+    return data
+
+def validate(data):
+    # Returns a list of problems; empty means the data is usable by the engine
+    errors = []
+    personas = data.get("personas")
+    if not isinstance(personas, list) or not personas:
+        errors.append("personas: expected a non-empty list")
+    else:
+        seen = set()
+        for i, p in enumerate(personas):
+            missing = [k for k in ("id", "name", "type", "income_level", "digital_literacy") if k not in p]
+            if missing:
+                errors.append(f"personas[{i}]: missing {', '.join(missing)}")
+                continue
+            if p["id"] in seen:
+                errors.append(f"personas[{i}]: duplicate id {p['id']}")
+            seen.add(p["id"])
+            if not isinstance(p["digital_literacy"], (int, float)) or not 0 <= p["digital_literacy"] <= 100:
+                errors.append(f"personas[{i}]: digital_literacy must be a number in 0-100")
+
+    competitors = data.get("competitors_db")
+    if not isinstance(competitors, dict):
+        errors.append("competitors_db: expected an object keyed by domain")
+    else:
+        for domain, entries in competitors.items():
+            for i, comp in enumerate(entries):
+                w = comp.get("weaknesses", {})
+                if "name" not in comp:
+                    errors.append(f"competitors_db.{domain}[{i}]: missing name")
+                for key in WEAKNESS_KEYS:
+                    score = w.get(key, {}).get("score")
+                    if not isinstance(score, (int, float)) or not 0 <= score <= 10:
+                        errors.append(f"competitors_db.{domain}[{i}].weaknesses.{key}: score must be a number in 0-10")
+
+    demographics = data.get("demographics", {})
+    for key in ("population_by_state", "urban_rural_split", "income_distribution", "internet_penetration"):
+        if not isinstance(demographics.get(key), dict):
+            errors.append(f"demographics: missing {key}")
+    if not isinstance(data.get("infrastructure", {}).get("cities"), dict):
+        errors.append("infrastructure: missing cities")
+    if not all(isinstance(v, (int, float)) for v in data.get("income_caps", {}).values()):
+        errors.append("income_caps: values must be numbers")
+    for attr in ("benchmarks", "solutions"):
+        if not isinstance(data.get(attr), dict):
+            errors.append(f"{attr}: expected an object")
+    return errors
+
+def compile_snapshot(data_dir, out_path):
+    data = load_json_sources(data_dir)
+    errors = validate(data)
+    if errors:
+        raise ValueError("Knowledge base validation failed:\n  " + "\n  ".join(errors))
+    payload = marshal.dumps(data)
+    header = HEADER.pack(MAGIC, sys.version_info.major, sys.version_info.minor, marshal.version,
+                         hashlib.sha256(payload).digest())
+    # Write then rename, so watchers never see a half-written snapshot
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, out_path)
+    return out_path
+
+def load_snapshot(path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, major, minor, marshal_version, digest = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a knowledge base snapshot")
+        if (major, minor, marshal_version) != (sys.version_info.major, sys.version_info.minor, marshal.version):
+            raise ValueError(f"{path} was built by Python {major}.{minor}; rebuild it with this interpreter")
+        view = memoryview(mm)[HEADER.size:]
+        try:
+            if hashlib.sha256(view).digest() != digest:
+                raise ValueError(f"{path} is corrupt (checksum mismatch)")
+            return marshal.loads(view)
+        finally:
+            view.release()
+
+def snapshot_signature(path):
+    # Changes whenever the snapshot file is replaced; None if it does not exist
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def main():
+    default_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="validate data/*.json and write the snapshot")
+    build.add_argument("--data-dir", default=default_data)
+    build.add_argument("--out", default=os.path.join(default_data, SNAPSHOT_NAME))
+    check = sub.add_parser("check", help="verify an existing snapshot")
+    check.add_argument("--snapshot", default=os.path.join(default_data, SNAPSHOT_NAME))
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            path = compile_snapshot(args.data_dir, args.out)
+            print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+        else:
+            errors = validate(load_snapshot(args.snapshot))
+            if errors:
+                raise ValueError("\n  ".join(errors))
+            print(f"{args.snapshot} OK")
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
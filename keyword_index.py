@@ -0,0 +1,57 @@
+import re
+
+# Single-pass keyword matcher. All vocabularies are compiled into one
+# trie-shaped regex, so the cost per text position depends on keyword
+# length rather than on how many keywords there are.
+
+class KeywordIndex:
+    def __init__(self, vocab):
+        # vocab: {category: [(keyword, value), ...]} in priority order (first wins)
+        self.entries = {}  # keyword -> [(category, priority, value)]
+        for category, pairs in vocab.items():
+            for priority, (keyword, value) in enumerate(pairs):
+                keyword = keyword.lower()
+                if keyword:
+                    self.entries.setdefault(keyword, []).append((category, priority, value))
+
+        # The regex reports the longest keyword starting at each position; any
+        # shorter keyword matching there is a prefix of it, so precompute those
+        # to keep plain substring semantics.
+        self.hits = {}
+        for keyword in self.entries:
+            self.hits[keyword] = [hit for k in self.entries if keyword.startswith(k) for hit in self.entries[k]]
+
+        self.categories = list(vocab)
+        self.pattern = re.compile(f"(?=({self._trie_pattern(self.entries)}))") if self.entries else None
+
+    @staticmethod
+    def _trie_pattern(keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = True
+
+        def build(node):
+            ends_here = '' in node
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ''
+            alt = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+            # Greedy optional group: prefer the longer keyword, fall back to the one ending here
+            return f"(?:{alt})?" if ends_here else alt
+
+        return build(trie)
+
+    def scan(self, text):
+        # Returns {category: value} for the highest-priority keyword of each category found in text
+        best = {}
+        if self.pattern is None:
+            return {}
+        for m in self.pattern.finditer(text.lower()):
+            for category, priority, value in self.hits[m.group(1)]:
+                current = best.get(category)
+                if current is None or priority < current[0]:
+                    best[category] = (priority, value)
+        return {category: value for category, (priority, value) in best.items()}
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Population cube over state x area (urban/rural) x income band x internet
+# access, built once per knowledge base load from indian_demographics.json
+# and infrastructure_readiness.json. The source data only has marginals, so
+# the axes are treated as independent, except that internet penetration
+# depends on the area. A segment size is one fancy-indexed sum over the cube.
+AREAS = ("urban", "rural")
+ACCESS = ("online", "offline")
+
+# infrastructure_readiness.json lists cities; readiness is averaged per state
+CITY_STATES = {
+    "Mumbai": "Maharashtra", "Pune": "Maharashtra", "Delhi NCR": "Delhi", "Bangalore": "Karnataka",
+    "Hyderabad": "Telangana", "Chennai": "Tamil Nadu", "Kolkata": "West Bengal", "Ahmedabad": "Gujarat",
+    "Jaipur": "Rajasthan", "Chandigarh": "Chandigarh", "Lucknow": "Uttar Pradesh", "Indore": "Madhya Pradesh",
+    "Patna": "Bihar", "Bhopal": "Madhya Pradesh", "Kochi": "Kerala"
+}
+
+class MarketCube:
+    def __init__(self, demographics, infrastructure):
+        population = demographics.get("population_by_state", {})
+        split = demographics.get("urban_rural_split", {})
+        income = demographics.get("income_distribution", {})
+        internet = demographics.get("internet_penetration", {})
+
+        self.states = list(population)
+        self.incomes = list(income)
+        self.positions = (
+            {s: i for i, s in enumerate(self.states)},
+            {a: i for i, a in enumerate(AREAS)},
+            {b: i for i, b in enumerate(self.incomes)},
+            {a: i for i, a in enumerate(ACCESS)},
+        )
+
+        pop = np.array([population[s] for s in self.states], dtype=np.float64)
+        area = np.array([split.get(a, 0.0) for a in AREAS])
+        bands = np.array([income[b] for b in self.incomes], dtype=np.float64)
+        online = np.array([internet.get(a, internet.get("overall", 0.0)) for a in AREAS])
+        access = np.stack([online, 1 - online], axis=1)  # (area, access)
+        self.cube = pop[:, None, None, None] * area[None, :, None, None] * bands[None, None, :, None] * access[None, :, None, :]
+
+        # Mean city readiness (0-1) per state; states without a listed city get the mean over all cities
+        scores = {}
+        for city, values in infrastructure.get("cities", {}).items():
+            state = CITY_STATES.get(city)
+            if state is not None and values:
+                scores.setdefault(state, []).append(sum(values.values()) / len(values) / 100.0)
+        overall = float(np.mean([v for vals in scores.values() for v in vals])) if scores else 0.0
+        self.readiness = np.array([np.mean(scores[s]) if s in scores else overall for s in self.states])
+
+        # state x income: online users, and urban online users weighted by how ready each
+        # state's cities are to serve them
+        self.online = self.cube[:, :, :, ACCESS.index("online")].sum(axis=1)
+        self.serviceable = self.cube[:, AREAS.index("urban"), :, ACCESS.index("online")] * self.readiness[:, None]
+        # Both summed over states, for the common nationwide query
+        self.online_by_income = self.online.sum(axis=0)
+        self.serviceable_by_income = self.serviceable.sum(axis=0)
+        self.nationwide_cache = {}
+
+    def _index(self, axis, values):
+        # Positions of `values` on an axis; None selects the whole axis
+        if values is None:
+            return np.arange(self.cube.shape[axis])
+        positions = self.positions[axis]
+        return np.array([positions[v] for v in values if v in positions], dtype=np.intp)
+
+    def size(self, states=None, areas=None, incomes=None, access=None):
+        # People in the segment; None on an axis means every value
+        index = np.ix_(self._index(0, states), self._index(1, areas), self._index(2, incomes), self._index(3, access))
+        return int(self.cube[index].sum())
+
+    def tam_sam(self, incomes=None, states=None):
+        # TAM: online users in the income bands. SAM: the urban share of them, readiness-weighted.
+        if states is None:
+            # Few distinct income selections, so nationwide results are kept
+            key = tuple(incomes) if incomes is not None else None
+            result = self.nationwide_cache.get(key)
+            if result is None:
+                i = self._index(2, incomes)
+                result = int(self.online_by_income[i].sum()), int(self.serviceable_by_income[i].sum())
+                if len(self.nationwide_cache) < 1024:
+                    self.nationwide_cache[key] = result
+            return result
+        index = np.ix_(self._index(0, states), self._index(2, incomes))
+        return int(self.online[index].sum()), int(self.serviceable[index].sum())
@@ -0,0 +1,290 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+import numpy as np
+
+# Latency histograms shared across gunicorn workers. Each process keeps its
+# counts in a memory-mapped file under METRICS_DIR, so an observation is a
+# bisect plus two in-memory adds. /metrics sums the files of every worker
+# and renders Prometheus text.
+DEFAULT_METRICS_DIR = os.path.join('/tmp', 'idea_sim_metrics')
+BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]
+QUANTILES = [0.5, 0.95, 0.99]
+MAX_SERIES = 256
+# Row layout: one count per bucket, then sum, then count
+SUM_COL = len(BUCKETS)
+COUNT_COL = len(BUCKETS) + 1
+
+HELP = {
+    "idea_sim_stage_seconds": "Time spent in each simulation pipeline stage.",
+    "idea_sim_http_request_seconds": "Flask request handling time until the response is returned.",
+    "idea_sim_admission_wait_seconds": "Time requests spent queued for an admission slot.",
+}
+
+class Metrics:
+    def __init__(self, directory=DEFAULT_METRICS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.pid = None
+        self.array = None
+        self.series = {}
+
+    def _open(self):
+        # Per-process storage, (re)created on first use after a fork
+        pid = os.getpid()
+        self.array = np.memmap(os.path.join(self.directory, f"{pid}.bin"), dtype=np.float64, mode='w+',
+                               shape=(MAX_SERIES, COUNT_COL + 1))
+        self.series = {}
+        self.pid = pid
+
+    def _row(self, metric, labels):
+        # Caller holds self.lock
+        key = (metric, labels)
+        row = self.series.get(key)
+        if row is None:
+            if len(self.series) >= MAX_SERIES:
+                return None
+            row = self.series[key] = len(self.series)
+            # Index of this process' rows, rewritten atomically when a series is added
+            index = [{"metric": m, "labels": dict(l), "row": r} for (m, l), r in self.series.items()]
+            path = os.path.join(self.directory, f"{self.pid}.json")
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(index, f)
+            os.replace(f"{path}.tmp", path)
+        return row
+
+    def observe(self, metric, seconds, **labels):
+        bucket = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            if self.pid != os.getpid():
+                self._open()
+            row = self._row(metric, tuple(sorted(labels.items())))
+            if row is None:
+                return
+            self.array[row, bucket] += 1
+            self.array[row, SUM_COL] += seconds
+            self.array[row, COUNT_COL] += 1
+
+    def span(self, metric, **labels):
+        return _Span(self, metric, labels)
+
+    def collect(self):
+        # Sums every worker's rows: {(metric, labels): array}
+        totals = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            pid = name[:-5]
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    index = json.load(f)
+                data = np.fromfile(os.path.join(self.directory, f"{pid}.bin"), dtype=np.float64)
+            except (OSError, ValueError):
+                continue
+            data = data.reshape(MAX_SERIES, COUNT_COL + 1)
+            for entry in index:
+                key = (entry["metric"], tuple(sorted(entry["labels"].items())))
+                if key in totals:
+                    totals[key] = totals[key] + data[entry["row"]]
+                else:
+                    totals[key] = data[entry["row"]].copy()
+        return totals
+
+    def render_prometheus(self):
+        totals = self.collect()
+        lines = []
+        for metric in sorted({m for m, _ in totals}):
+            series = sorted((labels, row) for (m, labels), row in totals.items() if m == metric)
+            lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, row in series:
+                cumulative = np.cumsum(row[:len(BUCKETS)])
+                for bound, count in zip(BUCKETS, cumulative):
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f"{metric}_bucket{_labels(labels, le=le)} {int(count)}")
+                lines.append(f"{metric}_sum{_labels(labels)} {row[SUM_COL]:.6f}")
+                lines.append(f"{metric}_count{_labels(labels)} {int(row[COUNT_COL])}")
+
+            # Quantiles estimated from the buckets, for dashboards without histogram_quantile
+            summary = f"{metric[:-len('_seconds')]}_quantile_seconds"
+            lines.append(f"# HELP {summary} p50/p95/p99 of {metric}, interpolated from its buckets.")
+            lines.append(f"# TYPE {summary} gauge")
+            for labels, row in series:
+                for q in QUANTILES:
+                    lines.append(f"{summary}{_labels(labels, quantile=str(q))} {bucket_quantile(q, row):.6f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        # Called once in the gunicorn master so dead workers from a previous run are not summed
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+def bucket_quantile(q, row):
+    counts = row[:len(BUCKETS)]
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    rank = q * total
+    cumulative = 0.0
+    lower = 0.0
+    for bound, count in zip(BUCKETS, counts):
+        if cumulative + count >= rank and count > 0:
+            if bound == float('inf'):
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return lower
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+class _Span:
+    def __init__(self, metrics, metric, labels):
+        self.metrics = metrics
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.metric, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class StageTimer:
+    # Progress callback that also records how long each stage took since the previous one
+    def __init__(self, metrics, progress=None):
+        self.metrics = metrics
+        self.progress = progress
+        self.last = time.perf_counter()
+        self.timings = {}
+
+    def __call__(self, stage):
+        elapsed = time.perf_counter() - self.last
+        self.timings[stage] = elapsed
+        self.metrics.observe("idea_sim_stage_seconds", elapsed, stage=stage)
+        if self.progress:
+            self.progress(stage)
+        # Time spent in the progress callback is not charged to the next stage
+        self.last = time.perf_counter()
+
+METRICS = Metrics(os.environ.get('METRICS_DIR', DEFAULT_METRICS_DIR))
+
+
+# --- Sampling profiler ---
+# Toggled at runtime for every worker through a small settings file in
+# METRICS_DIR. A profiled request gets a sampler thread that records its
+# stack every few milliseconds, and the collapsed stacks (flamegraph input)
+# are written to METRICS_DIR/profiles.
+PROFILER_SETTINGS = "profiler.json"
+PROFILER_CHECK_INTERVAL = 1.0
+MAX_PROFILES = 100
+
+class SamplingProfiler:
+    def __init__(self, directory):
+        self.directory = directory
+        self.profiles_dir = os.path.join(directory, 'profiles')
+        self.settings = {"enabled": False, "sample_rate": 1.0, "interval_ms": 5}
+        self._checked = 0.0
+        self._mtime = None
+
+    def configure(self, enabled, sample_rate=1.0, interval_ms=5):
+        settings = {"enabled": bool(enabled), "sample_rate": float(sample_rate), "interval_ms": float(interval_ms)}
+        path = os.path.join(self.directory, PROFILER_SETTINGS)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(settings, f)
+        os.replace(f"{path}.tmp", path)
+        self._checked = 0.0
+        return self.current_settings()
+
+    def current_settings(self):
+        now = time.monotonic()
+        if now - self._checked >= PROFILER_CHECK_INTERVAL:
+            self._checked = now
+            path = os.path.join(self.directory, PROFILER_SETTINGS)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if mtime != self._mtime:
+                    with open(path) as f:
+                        self.settings = json.load(f)
+                    self._mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return self.settings
+
+    def maybe_start(self, name):
+        settings = self.current_settings()
+        if not settings["enabled"] or random.random() >= settings["sample_rate"]:
+            return None
+        return _ProfileSession(self, name, threading.get_ident(), settings["interval_ms"] / 1000.0)
+
+    def save(self, name, stacks, duration):
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'request'
+        path = os.path.join(self.profiles_dir, f"{time.time():.6f}_{os.getpid()}_{safe}.folded")
+        with open(path, 'w') as f:
+            f.write(f"# {name} {duration * 1000:.1f} ms\n")
+            for stack, count in sorted(stacks.items(), key=lambda x: -x[1]):
+                f.write(f"{stack} {count}\n")
+        profiles = sorted(os.listdir(self.profiles_dir))
+        for old in profiles[:-MAX_PROFILES]:
+            try:
+                os.remove(os.path.join(self.profiles_dir, old))
+            except OSError:
+                pass
+        return path
+
+    def list_profiles(self):
+        if not os.path.isdir(self.profiles_dir):
+            return []
+        return sorted(os.listdir(self.profiles_dir), reverse=True)
+
+class _ProfileSession:
+    def __init__(self, profiler, name, thread_id, interval):
+        self.profiler = profiler
+        self.name = name
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.stop_event = threading.Event()
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        if self.stacks:
+            return self.profiler.save(self.name, self.stacks, time.perf_counter() - self.started)
+        return None
+
+PROFILER = SamplingProfiler(METRICS.directory)
@@ -1,15 +1,83 @@
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, LongTable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
+from xml.sax.saxutils import escape
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import io
 import json
+import os
 import random
+import threading
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    # Optional: without it, portfolios are laid out as one document in this process
+    PdfReader = PdfWriter = None
+
+# Styles never change between reports, so they are built once at import.
+_SAMPLE = getSampleStyleSheet()
+STYLES = {
+    "title": ParagraphStyle('TitleCustom', parent=_SAMPLE['Title'], fontSize=22, alignment=1, spaceAfter=20),
+    "h1": ParagraphStyle('H1Custom', parent=_SAMPLE['Heading1'], fontSize=16, spaceBefore=15, spaceAfter=10, textColor=colors.darkblue),
+    "normal": ParagraphStyle('NormalCustom', parent=_SAMPLE['BodyText'], fontSize=10, leading=14, alignment=4), # Justify
+    "h2": _SAMPLE['Heading2'],
+    "body": _SAMPLE['Normal'],
+}
+STYLES["subtitle"] = ParagraphStyle('Sub', parent=STYLES["title"], fontSize=16)
+
+COMPETITOR_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.darkgreen),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ('PADDING', (0,0), (-1,-1), 8),
+    ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+])
+
+RANKING_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.darkblue),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,-1), 8),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('ALIGN', (2,0), (3,-1), 'CENTER'),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.beige]),
+])
+
+# Fixed-text flowables, parsed once per thread. Flowables keep layout state
+# while a document builds, so a thread only ever reuses its own.
+_static = threading.local()
+
+def _static_flowables():
+    flowables = getattr(_static, 'flowables', None)
+    if flowables is None:
+        s = STYLES
+        flowables = _static.flowables = {
+            "cover_title": Paragraph("IDEA SIMULATION ENGINE", s["title"]),
+            "cover_subtitle": Paragraph("COMPREHENSIVE ANALYSIS REPORT", s["subtitle"]),
+            "methodology_title": Paragraph("RESEARCH METHODOLOGY", s["h1"]),
+            "methodology_intro": Paragraph("This analysis was conducted using a deterministic simulation models grounded in Indian demographic data benchmarks:", s["normal"]),
+            "findings_title": Paragraph("DETAILED ANALYSIS FINDINGS", s["h1"]),
+            "competitor_title": Paragraph("COMPETITOR WEAKNESS MAP", s["h1"]),
+            "recommendation_title": Paragraph("Strategic Recommendation:", s["h2"]),
+            "risk_title": Paragraph("RISK ANALYSIS & ACTION PLAN", s["h1"]),
+            "actions_title": Paragraph("Recommended Actions", s["h2"]),
+            "financial_sanity": Paragraph("• <b>Financial Sanity:</b> All revenue projections are auto-corrected for 'unicorn' inflation to ensure realism.", s["normal"]),
+        }
+    return flowables
 
 def generate_600_word_analysis(simulation_data):
     # Core dynamic analysis
     analysis = f"""
-    Our comprehensive simulation of the "{simulation_data['idea_title']}" concept reveals critical insights specifically tailored to the Indian market context. Scaling a solution for {simulation_data['target_user']} requires a nuanced understanding of competitor vulnerabilities.
+    Our comprehensive simulation of the "{escape(simulation_data['idea_title'])}" concept reveals critical insights specifically tailored to the Indian market context. Scaling a solution for {simulation_data['target_user']} requires a nuanced understanding of competitor vulnerabilities.
     
     The core value proposition targets the {simulation_data.get('target_user_segment', 'general population')}, representing a Serviceable Addressable Market (SAM) of approximately {simulation_data['users']:,} users. Based on our analysis of {simulation_data['competitor_count']} existing solutions, we have identified a distinct market gap in {simulation_data['market_gap']}.
     
@@ -54,52 +122,57 @@ def generate_600_word_analysis(simulation_data):
     return analysis
 
 def generate_detailed_pdf(sim_data, filename):
+    # `filename` is a path or a writable binary file object
     doc = SimpleDocTemplate(filename, pagesize=letter)
-    styles = getSampleStyleSheet()
+    doc.build(report_story(sim_data))
+    return filename
+
+def report_story(sim_data):
+    # Flowables of one idea's report, starting with its cover page
+    s = STYLES
+    static = _static_flowables()
+    normal = s["normal"]
     story = []
     
-    # Custom Styles
-    title_style = ParagraphStyle('TitleCustom', parent=styles['Title'], fontSize=22, alignment=1, spaceAfter=20)
-    h1 = ParagraphStyle('H1Custom', parent=styles['Heading1'], fontSize=16, spaceBefore=15, spaceAfter=10, textColor=colors.darkblue)
-    normal = ParagraphStyle('NormalCustom', parent=styles['BodyText'], fontSize=10, leading=14, alignment=4) # Justify
-    
     # 1. COVER PAGE
     story.append(Spacer(1, 1*inch))
-    story.append(Paragraph("IDEA SIMULATION ENGINE", title_style))
-    story.append(Paragraph("COMPREHENSIVE ANALYSIS REPORT", ParagraphStyle('Sub', parent=title_style, fontSize=16)))
+    story.append(static["cover_title"])
+    story.append(static["cover_subtitle"])
     story.append(Spacer(1, 1*inch))
-    story.append(Paragraph(f"<b>Idea:</b> {sim_data['idea_title']}", styles['Heading2']))
-    story.append(Paragraph(f"<b>Date:</b> {sim_data['date']}", styles['Normal']))
-    story.append(Paragraph(f"<b>Report ID:</b> {sim_data['report_id']}", styles['Normal']))
+    # The title is the user's idea text, so markup characters in it must not reach the parser
+    story.append(Paragraph(f"<b>Idea:</b> {escape(sim_data['idea_title'])}", s["h2"]))
+    story.append(Paragraph(f"<b>Date:</b> {sim_data['date']}", s["body"]))
+    story.append(Paragraph(f"<b>Report ID:</b> {sim_data['report_id']}", s["body"]))
     story.append(PageBreak())
     
     # 2. METHODOLOGY
-    story.append(Paragraph("RESEARCH METHODOLOGY", h1))
-    story.append(Paragraph("This analysis was conducted using a deterministic simulation models grounded in Indian demographic data benchmarks:", normal))
+    story.append(static["methodology_title"])
+    story.append(static["methodology_intro"])
     story.append(Spacer(1, 0.2*inch))
     
     methods = [
         f"• <b>Market Size:</b> Derived from census data segments, totaling {sim_data['tam']:,} addressable users.",
         f"• <b>Pricing Logic:</b> Benchmarked against {sim_data['domain']} standards adjusted for {sim_data['income_level']} income caps.",
         f"• <b>Adoption Modeling:</b> Uses conservative conversion rates (0.05%-0.2%) affected by a calculated Friction Score of {sim_data['friction_score']}/100.",
-        f"• <b>Risk Simulation:</b> 1,000 Monte Carlo iterations run to identify the primary failure point: {sim_data['primary_blocker']}.",
-        f"• <b>Financial Sanity:</b> All revenue projections are auto-corrected for 'unicorn' inflation to ensure realism."
+        f"• <b>Risk Simulation:</b> {sim_data.get('simulation_runs', 1000):,} Monte Carlo iterations run to identify the primary failure point: {sim_data['primary_blocker']}.",
     ]
     for m in methods:
         story.append(Paragraph(m, normal))
         story.append(Spacer(1, 6))
+    story.append(static["financial_sanity"])
+    story.append(Spacer(1, 6))
     
     # 3. DETAILED FINDINGS
     story.append(PageBreak())
-    story.append(Paragraph("DETAILED ANALYSIS FINDINGS", h1))
+    story.append(static["findings_title"])
     analysis_text = generate_600_word_analysis(sim_data)
     story.append(Paragraph(analysis_text, normal))
     
     # 4. COMPETITOR WEAKNESS ANALYSIS (Replaces Financials)
     story.append(PageBreak())
-    story.append(Paragraph("COMPETITOR WEAKNESS MAP", h1))
+    story.append(static["competitor_title"])
     
-    story.append(Paragraph(f"<b>Primary Attack Vector: {sim_data['market_gap']}</b>", styles['Heading2']))
+    story.append(Paragraph(f"<b>Primary Attack Vector: {sim_data['market_gap']}</b>", s["h2"]))
     story.append(Paragraph(f"Capture Potential: {sim_data['capture_potential']}% of competitor market share.", normal))
     story.append(Spacer(1, 10))
     
@@ -114,35 +187,137 @@ def generate_detailed_pdf(sim_data, filename):
         ])
     
     t = Table(comp_data, colWidths=[120, 80, 100, 80])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.darkgreen),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('PADDING', (0,0), (-1,-1), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-    ]))
+    t.setStyle(COMPETITOR_TABLE_STYLE)
     story.append(t)
     story.append(Spacer(1, 15))
-    story.append(Paragraph("Strategic Recommendation:", styles['Heading2']))
+    story.append(static["recommendation_title"])
     story.append(Paragraph(f"To exploit the identified gap in <b>{sim_data['attack_vector']}</b>, we recommend positioning the product specifically against the weaknesses of {sim_data['competitors'][0]['name']}. Their vulnerability in {sim_data['competitors'][0]['primary_weakness']} offers the highest ROI entry point.", normal))
     story.append(Spacer(1, 20))
     
     # 5. RISK & ACTION
-    story.append(Paragraph("RISK ANALYSIS & ACTION PLAN", h1))
+    story.append(static["risk_title"])
     
-    story.append(Paragraph(f"<b>Primary Risk:</b> {sim_data['top_risk']}", styles['Heading2']))
+    story.append(Paragraph(f"<b>Primary Risk:</b> {sim_data['top_risk']}", s["h2"]))
     story.append(Paragraph(f"Severity: {sim_data['top_risk_severity']}/10 | Impact: {sim_data['blocker_impact_pct']}% of funnel.", normal))
     story.append(Paragraph(f"<i>Mitigation: {sim_data['mitigation']}</i>", normal))
     story.append(Spacer(1, 10))
     
-    story.append(Paragraph("Recommended Actions", styles['Heading2']))
+    story.append(static["actions_title"])
     story.append(Paragraph(f"<b>1. Immediate (2 Weeks):</b> {sim_data['urgent_action']['description']}", normal))
     story.append(Paragraph(f"   (Cost: INR {sim_data['urgent_action']['cost_inr']:,})", normal))
     story.append(Spacer(1, 5))
     story.append(Paragraph(f"<b>2. Next Step (3 Months):</b> {sim_data['next_step']['description']}", normal))
     story.append(Paragraph(f"   (Cost: INR {sim_data['next_step']['cost_inr']:,})", normal))
+    return story
+
+# --- Portfolio reports ---
+# Many ideas in one document: a ranking table, then every idea's report in
+# rank order. Sections are laid out in chunks by worker processes and the
+# chunk PDFs are appended to the output as they arrive, in order, with only
+# a few chunks in flight. The writer still holds every merged page until the
+# document is written, so pass a file rather than a buffer to avoid a second
+# copy of the whole PDF.
+PORTFOLIO_CHUNK_SIZE = 10
+PORTFOLIO_IN_FLIGHT_PER_WORKER = 2
+MAX_TITLE_CHARS = 90
+
+def portfolio_ranking(results):
+    # Indexes of `results` best first: highest capture potential, then lowest friction
+    return sorted(range(len(results)), key=lambda i: (-results[i]['capture_potential'], results[i]['friction_score'], i))
 
-    doc.build(story)
+def _short_title(sim_data):
+    title = ' '.join(str(sim_data['idea_title']).split())
+    return title if len(title) <= MAX_TITLE_CHARS else title[:MAX_TITLE_CHARS - 3] + "..."
+
+class _SectionDocTemplate(SimpleDocTemplate):
+    # Adds an outline entry at the first flowable of each idea's section
+    def afterFlowable(self, flowable):
+        title = getattr(flowable, 'outline_title', None)
+        if title is not None:
+            key = f"section-{id(flowable)}"
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(title, key, level=0)
+
+def _ranking_story(results, order):
+    s = STYLES
+    cell = ParagraphStyle('RankingCell', parent=s["body"], fontSize=8, leading=10)
+    story = [
+        Paragraph("IDEA PORTFOLIO REPORT", s["title"]),
+        Paragraph(f"<b>Ideas:</b> {len(results)} | <b>Date:</b> {datetime.now().strftime('%Y-%m-%d')}", s["body"]),
+        Spacer(1, 0.2*inch),
+        Paragraph("COMPARATIVE RANKING", s["h1"]),
+        Paragraph("Ranked by capture potential, then by friction score (lower is better). "
+                  "Each idea's full report follows in this order.", s["normal"]),
+        Spacer(1, 10),
+    ]
+    rows = [['#', 'Idea', 'Capture', 'Friction', 'Top Blocker', 'Report ID']]
+    for rank, i in enumerate(order, 1):
+        r = results[i]
+        rows.append([rank, Paragraph(escape(_short_title(r)), cell), f"{r['capture_potential']}%",
+                     f"{r['friction_score']}/100", r['primary_blocker'], r['report_id']])
+    table = LongTable(rows, colWidths=[24, 210, 48, 48, 90, 110], repeatRows=1)
+    table.setStyle(RANKING_TABLE_STYLE)
+    story.append(table)
+    return story
+
+def _sections_story(sections):
+    # sections: [(rank, sim_data)]
+    story = []
+    for rank, sim_data in sections:
+        section = report_story(sim_data)
+        section[0].outline_title = f"#{rank} {_short_title(sim_data)}"
+        story.append(PageBreak())
+        story.extend(section)
+    return story
+
+def _render_sections(sections):
+    # Worker task: one PDF holding the report sections of `sections`
+    buffer = io.BytesIO()
+    # The leading PageBreak would leave a blank first page in a chunk of its own
+    _SectionDocTemplate(buffer, pagesize=letter).build(_sections_story(sections)[1:])
+    return buffer.getvalue()
+
+def _render_ranking(results, order):
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(_ranking_story(results, order))
+    return buffer.getvalue()
+
+def generate_portfolio_pdf(results, filename, workers=None, chunk_size=PORTFOLIO_CHUNK_SIZE):
+    # `results` are sim_data_flat dicts; `filename` is a path or a writable binary file object.
+    # Sections render in `workers` processes (default: one per CPU) when pypdf is available.
+    order = portfolio_ranking(results)
+    ranked = [(rank, results[i]) for rank, i in enumerate(order, 1)]
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    if PdfWriter is None:
+        doc = _SectionDocTemplate(filename, pagesize=letter)
+        doc.build(_ranking_story(results, order) + _sections_story(ranked))
+        return filename
+
+    chunks = [ranked[k:k + chunk_size] for k in range(0, len(ranked), chunk_size)]
+    writer = PdfWriter()
+    if workers <= 1 or len(chunks) <= 1:
+        writer.append(PdfReader(io.BytesIO(_render_ranking(results, order))))
+        for chunk in chunks:
+            writer.append(PdfReader(io.BytesIO(_render_sections(chunk))))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            remaining = iter(chunks)
+            pending = deque(pool.submit(_render_sections, chunk)
+                            for chunk in islice(remaining, workers * PORTFOLIO_IN_FLIGHT_PER_WORKER))
+            # The ranking pages are laid out here while the first chunks render
+            writer.append(PdfReader(io.BytesIO(_render_ranking(results, order))))
+            while pending:
+                pdf = pending.popleft().result()
+                chunk = next(remaining, None)
+                if chunk is not None:
+                    pending.append(pool.submit(_render_sections, chunk))
+                writer.append(PdfReader(io.BytesIO(pdf)))
+    writer.write(filename)
     return filename
+
+def render_pdf(sim_data):
+    # Renders into memory and returns the PDF bytes
+    buffer = io.BytesIO()
+    generate_detailed_pdf(sim_data, buffer)
+    return buffer.getvalue()
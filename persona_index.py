@@ -0,0 +1,45 @@
+from bisect import bisect_right
+
+# Lookup structure over the persona library, built once when the knowledge
+# base loads, so stage2_model_construction never sorts or walks the list.
+MATCH_CACHE_SIZE = 4096
+
+class PersonaIndex:
+    def __init__(self, personas):
+        self.personas = personas
+        self.by_id = {p['id']: p for p in personas}
+        self.by_type = {}
+        for p in personas:
+            self.by_type.setdefault(p['type'], []).append(p)
+
+        # Lower-cased names and types joined into one string; a substring search
+        # over it finds the first persona whose name or type contains the target.
+        # NUL separators keep a match from spanning two fields.
+        parts = []
+        self.offsets = []
+        pos = 0
+        for p in personas:
+            self.offsets.append(pos)
+            part = f"{p['name'].lower()}\x00{p['type'].lower()}\x00"
+            parts.append(part)
+            pos += len(part)
+        self.haystack = ''.join(parts)
+        self.match_cache = {}
+
+    def first_matching(self, target):
+        # First persona (library order) whose name or type contains `target`, case-insensitively
+        key = target.lower()
+        if key in self.match_cache:
+            return self.match_cache[key]
+        pos = self.haystack.find(key) if '\x00' not in key else -1
+        match = self.personas[bisect_right(self.offsets, pos) - 1] if pos >= 0 else None
+        if len(self.match_cache) >= MATCH_CACHE_SIZE:
+            self.match_cache.clear()
+        self.match_cache[key] = match
+        return match
+
+    def first_of_type(self, persona_type, exclude_id=None):
+        for p in self.by_type.get(persona_type, []):
+            if p['id'] != exclude_id:
+                return p
+        return None
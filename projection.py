@@ -0,0 +1,41 @@
+# Field projection for simulation results on the wire. Clients name the
+# parts they want as dotted paths ("report_id", "blocker_analysis.primary_blocker");
+# without a selection everything except the duplicated sim_data_flat (the
+# report generator's flat copy of the same data) is sent. "*" sends it all.
+DEFAULT_EXCLUDED = frozenset({"sim_data_flat"})
+MAX_FIELDS = 64
+
+def parse_fields(value):
+    # Returns (paths or None for the default, error_message); accepts "a,b.c" or ["a", "b.c"]
+    if value is None:
+        return None, None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(f, str) for f in value):
+        return None, "fields must be a comma-separated string or a list of strings"
+    paths = [f.strip() for f in value if f.strip()]
+    if not paths or len(paths) > MAX_FIELDS:
+        return None, f"fields must name between 1 and {MAX_FIELDS} paths"
+    return paths, None
+
+def project(result, paths=None):
+    # New dict holding only the selected parts; `result` itself is never modified
+    if paths is None:
+        return {k: v for k, v in result.items() if k not in DEFAULT_EXCLUDED}
+    if "*" in paths:
+        return result
+    out = {}
+    # Shorter paths first, so a parent that is already taken whole is never copied into
+    for path in sorted(set(paths), key=lambda p: p.count('.')):
+        keys = path.split('.')
+        src, dst = result, out
+        for depth, key in enumerate(keys):
+            if not isinstance(src, dict) or key not in src:
+                break
+            if depth == len(keys) - 1:
+                dst[key] = src[key]
+                break
+            if key in dst and dst[key] is src[key]:
+                break
+            src, dst = src[key], dst.setdefault(key, {})
+    return out
@@ -4,3 +4,5 @@ set -o errexit
 
 pip install -r requirements.txt
 python -m spacy download en_core_web_sm
+# Compile data/*.json into the knowledge base snapshot the workers memory-map
+python kb_snapshot.py build
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pdf_report_generator import render_pdf
+from metrics import METRICS
+
+# Report data and rendered PDFs shared by every worker on the box. The index
+# is a SQLite database in WAL mode next to the PDFs, so a download can be
+# served by any worker. PDFs are rendered in memory on first download (or
+# speculatively in the background) and, unless persistence is off, written
+# next to the index for later downloads. The store is bounded by size, age
+# and entry count, evicted least-recently-used first.
+DEFAULT_STORE_DIR = os.path.join('/tmp', 'idea_sim_reports')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+INDEX_NAME = 'reports.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id TEXT PRIMARY KEY,
+    sim_data TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    path TEXT,
+    size INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS reports_last_access ON reports (last_access);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created);
+"""
+
+class ReportStore:
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_seconds=DEFAULT_MAX_AGE_SECONDS, max_entries=DEFAULT_MAX_ENTRIES, render_workers=2,
+                 persist_pdfs=True):
+        self.directory = directory
+        self.persist_pdfs = persist_pdfs
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.local = threading.local()
+        self.render_locks = {}
+        self.render_locks_guard = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=render_workers, thread_name_prefix="pdf-render")
+        self._conn().executescript(SCHEMA)
+        self._sweep_stale_temp_files()
+
+    def _conn(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def _db(self):
+        return _Transaction(self._conn())
+
+    def put(self, sim_data):
+        now = time.time()
+        with self._db() as db:
+            inserted = db.execute(
+                "INSERT OR IGNORE INTO reports (report_id, sim_data, created, last_access) VALUES (?, ?, ?, ?)",
+                (sim_data['report_id'], json.dumps(sim_data), now, now)).rowcount
+            if not inserted:
+                db.execute("UPDATE reports SET last_access = ? WHERE report_id = ?", (now, sim_data['report_id']))
+            else:
+                doomed = self._evict(db)
+        if inserted:
+            self._remove_files(doomed)
+
+    def get_sim_data(self, report_id):
+        # The stored result of a live report, or None
+        row = self._touch(report_id)
+        return json.loads(row[1]) if row is not None else None
+
+    def prerender(self, report_id):
+        # Speculative render off the request path; only useful when PDFs are kept on disk
+        if not self.persist_pdfs:
+            return None
+        return self.executor.submit(self.get_pdf, report_id)
+
+    def get_pdf(self, report_id):
+        # Returns (path, None) for a PDF already on disk, (None, pdf_bytes) for a
+        # fresh render, or None for an unknown or expired report.
+        row = self._touch(report_id)
+        if row is None:
+            return None
+        path, sim_data = row
+        if path and os.path.exists(path):
+            return path, None
+
+        # One render per report within this process; another worker racing
+        # on the same report just writes an identical file.
+        with self.render_locks_guard:
+            render_lock = self.render_locks.setdefault(report_id, threading.Lock())
+        with render_lock:
+            try:
+                row = self._touch(report_id)
+                if row is None:
+                    return None
+                path, sim_data = row
+                if path and os.path.exists(path):
+                    return path, None
+
+                with METRICS.span("idea_sim_stage_seconds", stage="pdf_render"):
+                    pdf = render_pdf(json.loads(sim_data))
+                if self.persist_pdfs:
+                    self._persist(report_id, pdf)
+                return None, pdf
+            finally:
+                with self.render_locks_guard:
+                    self.render_locks.pop(report_id, None)
+
+    def _persist(self, report_id, pdf):
+        path = os.path.join(self.directory, f"Report_{report_id}.pdf")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The render is still served from memory
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._db() as db:
+            updated = db.execute("UPDATE reports SET path = ?, size = ? WHERE report_id = ?",
+                                 (path, len(pdf), report_id)).rowcount
+            doomed = self._evict(db, keep=report_id) if updated else []
+        self._remove_files(doomed)
+        if not updated:
+            # Evicted while rendering
+            self._remove_files([path])
+
+    def _touch(self, report_id):
+        # Returns (path, sim_data_json) for a live report and marks it recently used
+        cutoff = time.time() - self.max_age_seconds
+        with self._db() as db:
+            row = db.execute("SELECT path, sim_data, created FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            if row[2] < cutoff:
+                db.execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+                expired_path = row[0]
+            else:
+                db.execute("UPDATE reports SET last_access = ? WHERE report_id = ?", (time.time(), report_id))
+                return row[0], row[1]
+        self._remove_files([expired_path])
+        return None
+
+    def _evict(self, db, keep=None):
+        # Runs inside the caller's transaction; returns the files to delete once it commits
+        doomed = []
+        cutoff = time.time() - self.max_age_seconds
+        doomed += [r[0] for r in db.execute("SELECT path FROM reports WHERE created < ?", (cutoff,))]
+        db.execute("DELETE FROM reports WHERE created < ?", (cutoff,))
+
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reports").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return doomed
+        for report_id, path, size in db.execute(
+                "SELECT report_id, path, size FROM reports WHERE report_id != ? ORDER BY last_access",
+                (keep or '',)).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+            doomed.append(path)
+            count -= 1
+            total -= size
+        return doomed
+
+    def _remove_files(self, paths):
+        for path in paths:
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _sweep_stale_temp_files(self):
+        # Half-written renders left by crashed workers
+        cutoff = time.time() - 3600
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.tmp') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._db() as db:
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reports").fetchone()
+        return {"entries": count, "bytes": total, "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+class _Transaction:
+    # `with` block wrapped in BEGIN IMMEDIATE ... COMMIT, so workers serialize their writes
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,183 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+# Append-only log of every computed simulation: the scalar fields of
+# sim_data_flat plus per-stage timings, one row per run, in a local SQLite
+# table shared by all workers (WAL mode). Requests only append to an
+# in-memory buffer; a background thread per process writes it out in
+# batches. Aggregates run as indexed GROUP BY queries inside SQLite.
+DEFAULT_RUN_LOG_PATH = os.path.join('/tmp', 'idea_sim_runs', 'runs.sqlite3')
+FLUSH_ROWS = 500
+FLUSH_INTERVAL = 1.0
+# Rows beyond this are dropped (and counted) if the disk cannot keep up
+MAX_BUFFERED_ROWS = 100000
+
+# sim_data_flat fields kept per run, with their column types
+FIELDS = [
+    ("report_id", "TEXT"), ("date", "TEXT"), ("domain", "TEXT"), ("target_user", "TEXT"),
+    ("target_user_segment", "TEXT"), ("income_level", "TEXT"), ("tam", "INTEGER"), ("sam", "INTEGER"),
+    ("users", "INTEGER"), ("rpu", "INTEGER"), ("friction_score", "INTEGER"), ("capture_potential", "INTEGER"),
+    ("attack_vector", "TEXT"), ("primary_blocker", "TEXT"), ("blocker_severity", "REAL"),
+    ("blocker_impact_pct", "INTEGER"), ("simulation_runs", "INTEGER"),
+]
+# Stage timings in milliseconds (the stages of simulation_engine.PIPELINE_STAGES);
+# NULL for runs that were not timed (batch workers)
+TIMED_STAGES = [
+    "stage1_parsing", "stage2_model_construction", "stage3_env_calc", "stage4_collision",
+    "stage5_mutations", "analyze_competitors", "stage7_north_star", "stage8_assembly", "report"
+]
+COLUMNS = ["created"] + [name for name, _ in FIELDS] + [f"{s}_ms" for s in TIMED_STAGES] + ["total_ms"]
+# Columns the query API may group or filter by
+GROUPABLE = ("domain", "target_user", "target_user_segment", "income_level", "primary_blocker", "attack_vector")
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS runs (created REAL NOT NULL, {fields}, {timings}, total_ms REAL);\n".format(
+    fields=", ".join(f"{name} {kind}" for name, kind in FIELDS),
+    timings=", ".join(f"{s}_ms REAL" for s in TIMED_STAGES)) + """
+CREATE INDEX IF NOT EXISTS runs_domain_blocker ON runs (domain, primary_blocker);
+CREATE INDEX IF NOT EXISTS runs_domain_capture ON runs (domain, capture_potential);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+"""
+INSERT = f"INSERT INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+class RunLog:
+    def __init__(self, path=DEFAULT_RUN_LOG_PATH, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.dropped = 0
+        self.written = 0
+        self.wakeup = threading.Event()
+        self.writer_pid = None
+        self._conn().executescript(SCHEMA)
+        atexit.register(self.flush)
+
+    def _conn(self):
+        # One connection per thread and per process, as in ReportStore
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def append(self, sim_data, timings=None):
+        # `timings`: {stage: seconds}, as collected by metrics.StageTimer
+        row = [time.time()] + [sim_data.get(name) for name, _ in FIELDS]
+        if timings:
+            row += [round(timings[s] * 1000, 3) if s in timings else None for s in TIMED_STAGES]
+            row.append(round(sum(timings.values()) * 1000, 3))
+        else:
+            row += [None] * (len(TIMED_STAGES) + 1)
+        with self.lock:
+            if self.writer_pid != os.getpid():
+                # First append in this process (the writer thread does not survive a fork)
+                self.buffer = []
+                self.writer_pid = os.getpid()
+                threading.Thread(target=self._writer, name="run-log", daemon=True).start()
+            if len(self.buffer) >= MAX_BUFFERED_ROWS:
+                self.dropped += 1
+                return
+            self.buffer.append(row)
+            if len(self.buffer) >= self.flush_rows:
+                self.wakeup.set()
+
+    def _writer(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Run log write failed ({e}); will retry.")
+
+    def flush(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        if not rows:
+            return
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(INSERT, rows)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self.lock:
+                # Put the rows back in front for the next attempt
+                self.buffer[:0] = rows[:MAX_BUFFERED_ROWS - len(self.buffer)]
+            raise
+        with self.lock:
+            self.written += len(rows)
+
+    # --- Queries ---
+
+    def _where(self, filters, since):
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in GROUPABLE:
+                raise ValueError(f"Cannot filter by {column}; use one of {', '.join(GROUPABLE)}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(float(since))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def blocker_distribution(self, by="domain", filters=None, since=None):
+        # {group: {"runs": n, "blockers": {blocker: share}}}
+        if by not in GROUPABLE:
+            raise ValueError(f"Cannot group by {by}; use one of {', '.join(GROUPABLE)}")
+        where, params = self._where(filters, since)
+        rows = self._conn().execute(
+            f"SELECT {by}, primary_blocker, COUNT(*) FROM runs{where} GROUP BY {by}, primary_blocker", params).fetchall()
+        result = {}
+        for group, blocker, count in rows:
+            entry = result.setdefault(group, {"runs": 0, "blockers": {}})
+            entry["runs"] += count
+            entry["blockers"][blocker] = count
+        for entry in result.values():
+            entry["blockers"] = {b: round(c / entry["runs"], 4) for b, c in
+                                 sorted(entry["blockers"].items(), key=lambda x: -x[1])}
+        return result
+
+    def capture_histogram(self, bins=10, filters=None, since=None):
+        # Run counts of capture_potential (0-100%) in `bins` equal-width buckets
+        bins = int(bins)
+        if not 1 <= bins <= 100:
+            raise ValueError("bins must be between 1 and 100")
+        width = 100.0 / bins
+        where, params = self._where(filters, since)
+        rows = self._conn().execute(
+            f"SELECT MIN(CAST(capture_potential / ? AS INTEGER), ?), COUNT(*) FROM runs{where} GROUP BY 1",
+            [width, bins - 1] + params).fetchall()
+        counts = [0] * bins
+        for bucket, count in rows:
+            if bucket is not None:
+                counts[int(bucket)] += count
+        return {"bin_edges": [round(i * width, 2) for i in range(bins + 1)], "counts": counts}
+
+    def frame(self, columns=None, filters=None, since=None, limit=None):
+        # Raw rows as a pandas DataFrame, for ad-hoc analysis
+        import pandas as pd
+        columns = columns or COLUMNS
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        where, params = self._where(filters, since)
+        sql = f"SELECT {', '.join(columns)} FROM runs{where}" + (f" LIMIT {int(limit)}" if limit else "")
+        return pd.read_sql_query(sql, self._conn(), params=params)
+
+    def stats(self):
+        with self.lock:
+            buffered, written, dropped = len(self.buffer), self.written, self.dropped
+        return {"buffered": buffered, "written": written, "dropped": dropped, "path": self.path}
@@ -1,86 +1,591 @@
-import json
-import random
 import time
 import os
 import hashlib
+import secrets
 import re
 import math
+import threading
+import unicodedata
 from datetime import datetime
-from pdf_report_generator import generate_detailed_pdf
+from types import SimpleNamespace
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from report_store import ReportStore, DEFAULT_STORE_DIR
+from keyword_index import KeywordIndex
+from persona_index import PersonaIndex
+from competitor_index import CompetitorIndex
+from text_index import TextIndex
+from market_cube import MarketCube
+from memo_cache import MemoCache
+from stage_graph import Stage, StageGraph, fingerprint, seeded_rng
+from run_log import RunLog, DEFAULT_RUN_LOG_PATH
+from pdf_report_generator import generate_portfolio_pdf
+from metrics import METRICS, StageTimer
+from kb_snapshot import KB_FILES, SNAPSHOT_NAME, load_json_sources, load_snapshot, snapshot_signature, validate
+
+# Monte Carlo run counts for stage4_collision (overridable per request)
+DEFAULT_SIMULATION_RUNS = 100000
+MAX_SIMULATION_RUNS = 10000000
+# Adaptive mode: sample in chunks until every blocker's 95% interval is at most
+# +/- tolerance wide. simulation_runs then caps the total.
+MIN_TOLERANCE = 0.0005
+MAX_TOLERANCE = 0.25
+ADAPTIVE_CHUNK_RUNS = 2000
+
+BLOCKER_TYPES = ["Trust Collisions", "Adoption Friction", "Price Misfits", "Timing Misfires"]
+
+# Pipeline steps in execution order, as reported to progress callbacks
+PIPELINE_STAGES = [
+    "stage1_parsing", "stage2_model_construction", "stage3_env_calc", "stage4_collision",
+    "stage5_mutations", "analyze_competitors", "stage7_north_star", "stage8_assembly", "report"
+]
+
+# stage1_parsing only reads POS tags, lemmas and noun_chunks, so NER is never loaded.
+# Override with SPACY_EXCLUDE="" to load the full pipeline.
+SPACY_MODEL = "en_core_web_sm"
+SPACY_EXCLUDE = ["ner"]
+
+# stage1_parsing vocabularies, in priority order (first match wins)
+TARGET_KEYWORDS = [
+    ("student", "Student"), ("business", "Small Business Owner"), ("sme", "Small Business Owner"),
+    ("farmer", "Farmer"), ("doctor", "Doctor")
+]
+DOMAIN_KEYWORDS = [
+    ("food", "Food & Hospitality"), ("health", "Health & Wellness"), ("shop", "E-commerce & Retail"),
+    ("retail", "E-commerce & Retail"), ("finance", "FinTech"), ("education", "EdTech"), ("learn", "EdTech")
+]
+B2B_KEYWORDS = [("enterprise", True)]
+
+# stage3_env_calc: income pressure per persona income level (price_fit = 100 - pressure),
+# and domains where trust is harder to earn
+INCOME_PRESSURE = {"Deprived": 90, "Aspirers": 70, "Middle Class": 50, "Affluent": 30, "Elite": 10}
+LOW_TRUST_DOMAINS = ("FinTech", "Health & Wellness")
+LOW_TRUST_PENALTY = 20
+
+# Domain names as produced by stage1_parsing -> competitor_database.json keys
+COMPETITOR_DOMAINS = {
+    "Tech & SaaS": "tech_saas",
+    "Food & Hospitality": "food_hospitality",
+    "EdTech": "edtech",
+    "FinTech": "fintech",
+    "Health & Wellness": "health_wellness",
+    "E-commerce & Retail": "retail_ecommerce"
+}
+
+# The demographic cube counts people; B2B ideas are sized by the number of SMEs
+B2B_TAM = 8000000
+
+# Parameter sweeps: axes a grid may vary, and the largest grid accepted
+SWEEP_AXES = ("income_level", "domain", "trust", "price_fit_delta")
+MAX_SWEEP_CELLS = 100000
+
+# Batch mode: texts per nlp.pipe batch and parsed ideas per process-pool task
+BATCH_NLP_SIZE = 256
+BATCH_CHUNK_SIZE = 64
+BATCH_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Seconds between checks for a rebuilt knowledge base snapshot
+KB_RELOAD_INTERVAL = 2.0
+
+def _kb_attr(name):
+    # Engine attributes backed by the current knowledge base, which is swapped as a whole.
+    # A run reads self.kb once and passes it to its stages, so it never mixes two versions.
+    return property(lambda self: getattr(self.kb, name))
 
 class SimulationEngine:
-    def __init__(self):
+    demographics = _kb_attr('demographics')
+    benchmarks = _kb_attr('benchmarks')
+    infrastructure = _kb_attr('infrastructure')
+    personas = _kb_attr('personas')
+    solutions = _kb_attr('solutions')
+    income_caps = _kb_attr('income_caps')
+    competitors_db = _kb_attr('competitors_db')
+    persona_index = _kb_attr('persona_index')
+    keyword_index = _kb_attr('keyword_index')
+    competitor_index = _kb_attr('competitor_index')
+    market_cube = _kb_attr('market_cube')
+    competitor_catalog = _kb_attr('competitor_catalog')
+    competitor_search = _kb_attr('competitor_search')
+    persona_search = _kb_attr('persona_search')
+
+    def __init__(self, prerender_reports=False, use_nlp=True, deterministic=True):
         self.data_path = os.path.join(os.path.dirname(__file__), 'data')
+        self.snapshot_path = os.environ.get('KB_SNAPSHOT', os.path.join(self.data_path, SNAPSHOT_NAME))
+        self.kb_signature = None
+        self._kb_checked = time.monotonic()
+        self._kb_lock = threading.Lock()
         self.load_knowledge_base()
-        self.report_cache = {} 
+        self.report_store = ReportStore(os.environ.get('REPORT_STORE_DIR', DEFAULT_STORE_DIR),
+                                        persist_pdfs=os.environ.get('REPORT_PERSIST_PDFS', '1') != '0')
+        # Every computed run is appended for offline analysis; RUN_LOG_PATH= (empty) turns it off
+        run_log_path = os.environ.get('RUN_LOG_PATH', DEFAULT_RUN_LOG_PATH)
+        self.run_log = RunLog(run_log_path) if run_log_path else None
+        # PDFs render on first download unless speculative prerendering is on
+        self.prerender_reports = prerender_reports
+        self.rng = np.random.default_rng()
+        # Deterministic mode seeds stage 3 from the idea text and stage 4 from its inputs,
+        # which makes results memoizable
+        self.deterministic = deterministic
+        self.memo = MemoCache()
+        # Per-stage outputs of deterministic runs, so edited ideas only rerun what changed
+        self.stages = StageGraph()
+        # Engines built before a fork (gunicorn --preload) must not share RNG state
+        os.register_at_fork(after_in_child=self.reset_rng)
         self.nlp = None
-        self.load_nlp()
+        # Process pools for run_batch by worker count, created on first use
+        self._batch_pools = {}
+        self._batch_pool_lock = threading.Lock()
+        if use_nlp:
+            self.load_nlp()
+
+    def reset_rng(self):
+        self.rng = np.random.default_rng()
 
     def load_nlp(self):
+        exclude = os.environ.get('SPACY_EXCLUDE')
+        exclude = [p for p in exclude.split(',') if p] if exclude is not None else SPACY_EXCLUDE
         try:
             import spacy
-            self.nlp = spacy.load("en_core_web_sm")
-            print("spaCy model loaded successfully.")
+            self.nlp = spacy.load(SPACY_MODEL, exclude=exclude)
+            print(f"spaCy model loaded successfully (pipes: {', '.join(self.nlp.pipe_names)}).")
         except Exception as e:
             print(f"spaCy load failed: {e}. Using regex fallback.")
             self.nlp = None
 
     def load_knowledge_base(self):
+        # Data and every index derived from it are built first, then swapped in with one assignment.
+        # Startup fails loudly rather than serving a knowledge base no request could use.
+        kb = SimpleNamespace(**self._read_knowledge_base())
+        try:
+            self.build_indexes(kb)
+        except Exception as e:
+            raise RuntimeError(f"Knowledge base indexes could not be built: {e}") from e
+        # Part of every memo and stage-cache key, so results of an older version are never served
+        kb.generation = 0
+        self.kb = kb
+
+    def _read_knowledge_base(self):
+        signature = snapshot_signature(self.snapshot_path)
+        if signature is not None:
+            try:
+                data = load_snapshot(self.snapshot_path)
+                self.kb_signature = signature
+                self._warn_if_snapshot_stale()
+                return data
+            except Exception as e:
+                print(f"Knowledge base snapshot unusable ({e}). Loading JSON files.")
         try:
-            with open(os.path.join(self.data_path, 'indian_demographics.json')) as f:
-                self.demographics = json.load(f)
-            with open(os.path.join(self.data_path, 'industry_benchmarks.json')) as f:
-                self.benchmarks = json.load(f)
-            with open(os.path.join(self.data_path, 'infrastructure_readiness.json')) as f:
-                self.infrastructure = json.load(f)
-            with open(os.path.join(self.data_path, 'persona_library.json')) as f:
-                self.personas = json.load(f)
-            with open(os.path.join(self.data_path, 'solution_templates.json')) as f:
-                self.solutions = json.load(f)
-            # Load new strict caps
-            with open(os.path.join(self.data_path, 'income_spend_caps.json')) as f:
-                self.income_caps = json.load(f)
-            # Load Competitor DB
-            with open(os.path.join(self.data_path, 'competitor_database.json')) as f:
-                self.competitors_db = json.load(f)
+            data = load_json_sources(self.data_path)
         except Exception as e:
-            print(f"CRITICAL ERROR in load_knowledge_base: {e}")
-            import traceback
-            traceback.print_exc()
-            self.income_caps = {"middle_class": 800} 
-            self.competitors_db = {}
-
-    def run_simulation(self, idea_text):
-        # 1. Parsing
-        dna = self.stage1_parsing(idea_text)
-        # 2. Modeling
-        model = self.stage2_model_construction(dna)
-        # 3. Env Factors
-        env_factors = self.stage3_env_calc(model, dna)
-        # 4. Collisions
-        blocker_analysis = self.stage4_collision(model, env_factors)
-        # 5. Mutations
-        mutations = self.stage5_mutations(blocker_analysis)
-        # 6. COMPETITOR ANALYSIS (Replaces Financials)
-        competitor_map = self.analyze_competitors(dna, env_factors)
-        # 7. North Star
-        north_star = self.stage7_north_star(dna)
-        # 8. Assembly
-        final_output = self.stage8_assembly(dna, north_star, model, blocker_analysis, mutations, competitor_map, env_factors)
+            raise RuntimeError(f"Knowledge base could not be loaded from {self.data_path}: {e}") from e
+        # The checks `kb_snapshot.py build` applies; problems are reported, the data is still served
+        errors = validate(data)
+        if errors:
+            print("WARNING: knowledge base validation failed:\n  " + "\n  ".join(errors))
+        return data
+
+    def _warn_if_snapshot_stale(self):
+        snapshot_mtime = os.path.getmtime(self.snapshot_path)
+        stale = [f for f in KB_FILES.values()
+                 if os.path.exists(os.path.join(self.data_path, f))
+                 and os.path.getmtime(os.path.join(self.data_path, f)) > snapshot_mtime]
+        if stale:
+            print(f"WARNING: {', '.join(stale)} newer than {self.snapshot_path}; run `python kb_snapshot.py build`.")
+
+    def maybe_reload_knowledge_base(self):
+        # Cheap, rate-limited check for a rebuilt snapshot; in-flight runs keep the kb they started with
+        now = time.monotonic()
+        if now - self._kb_checked < KB_RELOAD_INTERVAL:
+            return False
+        self._kb_checked = now
+        signature = snapshot_signature(self.snapshot_path)
+        if signature is None or signature == self.kb_signature:
+            return False
+        with self._kb_lock:
+            if signature == self.kb_signature:
+                return False
+            try:
+                kb = SimpleNamespace(**load_snapshot(self.snapshot_path))
+                self.build_indexes(kb)
+            except Exception as e:
+                print(f"Knowledge base reload failed ({e}). Keeping current data.")
+                self.kb_signature = signature
+                return False
+            kb.generation = self.kb.generation + 1
+            self.kb = kb
+            self.kb_signature = signature
+            self.memo.clear()
+            self.stages.clear()
+            print(f"Knowledge base reloaded from {self.snapshot_path}.")
+        return True
+
+    def build_indexes(self, kb):
+        kb.persona_index = PersonaIndex(kb.personas)
+        kb.competitor_index = CompetitorIndex(kb.competitors_db)
+        kb.market_cube = MarketCube(kb.demographics, kb.infrastructure)
+        # BM25 text search over every competitor (name, domain, weakness descriptions)
+        # and every persona (name, type, income level, goals)
+        kb.competitor_catalog = [(key, c) for key, comps in kb.competitors_db.items() for c in comps]
+        kb.competitor_search = TextIndex([
+            ' '.join([c['name'], key.replace('_', ' ')] + [w.get('desc', '') for w in c.get('weaknesses', {}).values()])
+            for key, c in kb.competitor_catalog
+        ])
+        kb.persona_search = TextIndex([
+            ' '.join([p['name'], p['type'], p.get('income_level', '')] + p.get('goals', []))
+            for p in kb.personas
+        ])
+        # Persona first names and types, in library order, so the first persona matched wins
+        persona_keywords = []
+        for p in kb.personas:
+            persona_keywords.append((p['name'].split()[0], p['type']))
+            persona_keywords.append((p['type'], p['type']))
+        kb.keyword_index = KeywordIndex({
+            "persona": persona_keywords,
+            "target": TARGET_KEYWORDS,
+            "domain": DOMAIN_KEYWORDS,
+            "b2b": B2B_KEYWORDS
+        })
+
+    @staticmethod
+    def normalize_idea(text):
+        return ' '.join(unicodedata.normalize('NFC', text).split())
+
+    def idea_seed(self, text):
+        # Seed from a hash of the normalized idea text
+        digest = hashlib.sha256(self.normalize_idea(text).encode()).digest()
+        return int.from_bytes(digest[:8], 'little')
+
+    def idea_rng(self, text):
+        return np.random.default_rng(self.idea_seed(text))
+
+    def run_simulation(self, idea_text, simulation_runs=DEFAULT_SIMULATION_RUNS, progress=None, deterministic=None,
+                       tolerance=None):
+        # `progress(stage_name)` is called after each step in PIPELINE_STAGES completes.
+        # With `tolerance`, stage 4 samples adaptively (see stage4_collision).
+        # Deterministic results are memoized and shared between callers, so treat them as read-only.
+        deterministic = self.deterministic if deterministic is None else deterministic
+        self.maybe_reload_knowledge_base()
+        kb = self.kb
+
+        memo_key = (kb.generation, self.normalize_idea(idea_text), simulation_runs, tolerance) if deterministic else None
+        if memo_key:
+            with METRICS.span("idea_sim_stage_seconds", stage="memo_lookup"):
+                cached = self.memo.get(memo_key)
+            if cached is not None:
+                # Re-register in case the report store evicted it meanwhile
+                self.save_report_for_download(cached)
+                for stage in PIPELINE_STAGES:
+                    if progress:
+                        progress(stage)
+                return {**cached, "reused_stages": list(PIPELINE_STAGES)}
+
+        # Times each stage as it reports completion
+        notify = StageTimer(METRICS, progress)
+        reused = []
+        # 1. Parsing (deterministic runs reuse the parse of an identical text)
+        dna = self.stages.run_stage("stage1_parsing", (idea_text, self.nlp is not None),
+                                    lambda rng: self.stage1_parsing(idea_text, kb=kb),
+                                    None if deterministic else self.rng, reused, generation=kb.generation)
+        notify("stage1_parsing")
+        final_output = self.run_from_dna(dna, simulation_runs, notify, deterministic, tolerance, reused, kb)
         
-        # Generator PDF
+        # Register report data; the PDF itself is rendered off the request path
         self.save_report_for_download(final_output)
+        notify("report")
+        self.log_run(final_output, notify.timings)
+
+        if memo_key:
+            self.memo.put(memo_key, final_output)
         
         return final_output
 
-    def stage1_parsing(self, text):
-        clean_text = re.sub(r'[^\w\s]', '', text.lower())
+    def run_from_dna(self, dna, simulation_runs=DEFAULT_SIMULATION_RUNS, notify=None, deterministic=False,
+                     tolerance=None, reused=None, kb=None):
+        # Stages 2-8 for an already parsed idea; no report is registered. Deterministic runs
+        # reuse cached stage outputs whose inputs are unchanged and list them in "reused_stages".
+        kb = kb if kb is not None else self.kb
+        reused = reused if reused is not None else []
+        out = self.stages.run(self.pipeline_graph(simulation_runs, tolerance, kb), {"stage1_parsing": dna},
+                              rng=None if deterministic else self.rng, notify=notify, reused=reused,
+                              generation=kb.generation)
+        # 8. Assembly (a new report every run)
+        final_output = self.stage8_assembly(dna, out["stage7_north_star"], out["stage2_model_construction"],
+                                            out["stage4_collision"], out["stage5_mutations"],
+                                            out["analyze_competitors"], out["stage3_env_calc"], kb)
+        if notify:
+            notify("stage8_assembly")
+        final_output["reused_stages"] = reused
+        return final_output
+
+    def pipeline_graph(self, simulation_runs=DEFAULT_SIMULATION_RUNS, tolerance=None, kb=None):
+        # Stages 2-7 in execution order, all reading `kb`. `inputs` must cover everything else
+        # a stage reads: it is the stage's cache key and, for random stages, its seed.
+        kb = kb if kb is not None else self.kb
+
+        def persona_fallback(dna):
+            # stage2 reads the idea text only when no persona name or type matches the target user
+            if kb.persona_index.first_matching(dna['target_user']) is None:
+                return kb.persona_search.query_terms(dna['original_text'])
+            return None
+
+        def persona_inputs(model):
+            persona = model['personas'][0]
+            return persona['income_level'], persona['digital_literacy']
+
+        return {
+            "stage2_model_construction": Stage(
+                ("stage1_parsing",),
+                lambda dna: (dna['action'], dna['target_user'], persona_fallback(dna)),
+                lambda rng, dna: self.stage2_model_construction(dna, kb)),
+            # Deterministic runs draw the trust score from the idea text's own seed (not the
+            # stage fingerprint), so ideas sharing a domain and persona still differ
+            "stage3_env_calc": Stage(
+                ("stage1_parsing", "stage2_model_construction"),
+                lambda dna, model: (dna['domain'], persona_inputs(model), self.idea_seed(dna['original_text'])),
+                lambda rng, dna, model: self.stage3_env_calc(
+                    model, dna, rng if rng is not None else self.idea_rng(dna['original_text']))),
+            "stage4_collision": Stage(
+                ("stage2_model_construction", "stage3_env_calc"),
+                lambda model, env: (env['trust'], env['digital_literacy'], env['price_fit'], env['infrastructure'],
+                                    int(simulation_runs), tolerance),
+                lambda rng, model, env: self.stage4_collision(model, env, simulation_runs, rng, tolerance),
+                random=True),
+            "stage5_mutations": Stage(
+                ("stage4_collision",),
+                lambda blocker: (),
+                lambda rng, blocker: self.stage5_mutations(blocker)),
+            "analyze_competitors": Stage(
+                ("stage1_parsing", "stage3_env_calc"),
+                lambda dna, env: (dna['domain'], dna['target_user'],
+                                  kb.competitor_search.query_terms(dna['original_text'])),
+                lambda rng, dna, env: self.analyze_competitors(dna, env, kb)),
+            "stage7_north_star": Stage(
+                ("stage1_parsing",),
+                lambda dna: (),
+                lambda rng, dna: self.stage7_north_star(dna)),
+        }
+
+    def run_sweep(self, idea_text, grid=None, simulation_runs=DEFAULT_SIMULATION_RUNS, deterministic=None):
+        # Sensitivity surface for one idea: stages 3, 4 and the competitor map evaluated over
+        # every combination of the values in `grid` ({axis: [values]} for axes in SWEEP_AXES).
+        # Axes left out stay at the idea's own value.
+        deterministic = self.deterministic if deterministic is None else deterministic
+        self.maybe_reload_knowledge_base()
+        kb = self.kb
+        with METRICS.span("idea_sim_stage_seconds", stage="sweep"):
+            dna = self.stage1_parsing(idea_text, kb=kb)
+            return self.sweep_from_dna(dna, grid or {}, simulation_runs, deterministic, kb)
+
+    def sweep_from_dna(self, dna, grid, simulation_runs=DEFAULT_SIMULATION_RUNS, deterministic=False, kb=None):
+        kb = kb if kb is not None else self.kb
+        runs = int(simulation_runs)
+        if runs < 1 or runs > MAX_SIMULATION_RUNS:
+            raise ValueError(f"simulation_runs must be between 1 and {MAX_SIMULATION_RUNS}")
+        unknown = set(grid) - set(SWEEP_AXES)
+        if unknown:
+            raise ValueError(f"Unknown sweep axes: {', '.join(sorted(unknown))}")
+
+        # The idea's own model and environment, shared with run_simulation through the stage cache
+        graph = self.pipeline_graph(runs, kb=kb)
+        out = self.stages.run({s: graph[s] for s in ("stage2_model_construction", "stage3_env_calc")},
+                              {"stage1_parsing": dna}, rng=None if deterministic else self.rng,
+                              generation=kb.generation)
+        model, env = out["stage2_model_construction"], out["stage3_env_calc"]
+        persona = model['personas'][0]
+        # Seeded like the idea's own stage4_collision, so the idea's cell (when first) matches run_simulation
+        if deterministic:
+            rng = seeded_rng(fingerprint("stage4_collision", graph["stage4_collision"].inputs(model, env)))
+        else:
+            rng = self.rng
+        base_trust = env['trust'] + (LOW_TRUST_PENALTY if dna['domain'] in LOW_TRUST_DOMAINS else 0)
+        axes = {
+            "income_level": list(grid.get("income_level") or [persona['income_level']]),
+            "domain": list(grid.get("domain") or [dna['domain']]),
+            "trust": list(grid.get("trust") or [base_trust]),
+            "price_fit_delta": list(grid.get("price_fit_delta") or [0]),
+        }
+        # Checked before the membership tests, which would raise TypeError on a list or dict
+        for axis in ("income_level", "domain"):
+            if not all(isinstance(v, str) for v in axes[axis]):
+                raise ValueError(f"{axis} values must be strings")
+        bad = [v for v in axes["income_level"] if v not in INCOME_PRESSURE and v != persona['income_level']]
+        if bad:
+            raise ValueError(f"income_level must be one of {', '.join(INCOME_PRESSURE)}")
+        bad = [v for v in axes["domain"] if v not in COMPETITOR_DOMAINS and v != dna['domain']]
+        if bad:
+            raise ValueError(f"domain must be one of {', '.join(COMPETITOR_DOMAINS)}")
+        for axis, low, high in (("trust", 0, 100), ("price_fit_delta", -100, 100)):
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and low <= v <= high for v in axes[axis]):
+                raise ValueError(f"{axis} values must be numbers in {low}-{high}")
+        shape = tuple(len(axes[a]) for a in SWEEP_AXES)
+        cells = math.prod(shape)
+        if cells > MAX_SWEEP_CELLS:
+            raise ValueError(f"Sweep grid has {cells} cells; at most {MAX_SWEEP_CELLS} allowed")
+
+        # One value per axis position, broadcast over the (income, domain, trust, price) grid
+        pressure = np.array([INCOME_PRESSURE.get(v, 50) for v in axes["income_level"]], dtype=float)[:, None, None, None]
+        penalty = np.array([LOW_TRUST_PENALTY if d in LOW_TRUST_DOMAINS else 0 for d in axes["domain"]], dtype=float)[None, :, None, None]
+        trust_base = np.array(axes["trust"], dtype=float)[None, None, :, None]
+        delta = np.array(axes["price_fit_delta"], dtype=float)[None, None, None, :]
+
+        # stage3_env_calc
+        trust = np.broadcast_to(np.trunc(trust_base) - penalty, shape)
+        price_fit = np.broadcast_to(np.clip(np.trunc(100 - pressure + delta), 0, 100), shape)
+        literacy = env['digital_literacy']
+        friction = np.trunc((trust + price_fit + env['competition'] + literacy) / 4).astype(int)
+
+        # stage4_collision, all cells in one binomial draw (columns in BLOCKER_TYPES order)
+        p_fail = np.stack([
+            (100 - trust) / 100.0,
+            np.full(shape, (100 - literacy) / 100.0),
+            (100 - price_fit) / 100.0,
+            np.full(shape, (100 - env['infrastructure']) / 100.0),
+        ], axis=-1).clip(0.0, 1.0)
+        failures = rng.binomial(runs, p_fail)
+        top = failures.argmax(axis=-1)
+        top_probability = np.take_along_axis(failures, top[..., None], axis=-1)[..., 0] / runs
+
+        # The competitor map depends only on the domain, so it runs once per domain value
+        capture = np.empty(len(axes["domain"]), dtype=int)
+        attack_vectors = []
+        for i, domain in enumerate(axes["domain"]):
+            competitor_map = self.analyze_competitors({**dna, "domain": domain}, env, kb=kb)
+            capture[i] = competitor_map['market_share_potential']
+            attack_vectors.append(competitor_map['primary_attack_vector'])
+        capture = np.broadcast_to(capture[None, :, None, None], shape)
+
+        # Surfaces are flattened in C order over `shape`
+        return {
+            "idea_dna": dna,
+            "axes": axes,
+            "shape": list(shape),
+            "simulation_runs": runs,
+            "friction_score": friction.ravel().tolist(),
+            "top_blocker": [BLOCKER_TYPES[i] for i in top.ravel().tolist()],
+            "top_blocker_probability": np.round(top_probability, 4).ravel().tolist(),
+            "capture_potential": capture.ravel().tolist(),
+            "attack_vector_by_domain": dict(zip(axes["domain"], attack_vectors)),
+        }
+
+    def run_batch(self, ideas, simulation_runs=DEFAULT_SIMULATION_RUNS, include_pdf=False, workers=None, deterministic=None):
+        # Yields (index, result_or_exception) as ideas complete, not in input order.
+        # Texts go through nlp.pipe in batches; stages 2-8 fan out over a process pool.
+        ideas = list(ideas)
+        deterministic = self.deterministic if deterministic is None else deterministic
+        self.maybe_reload_knowledge_base()
+        kb = self.kb
+        dnas = self._parse_batch(ideas, kb)
+
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if workers <= 1 or len(ideas) <= BATCH_CHUNK_SIZE:
+            for i, dna in dnas:
+                if isinstance(dna, Exception):
+                    yield i, dna
+                    continue
+                try:
+                    result = self.run_from_dna(dna, simulation_runs, deterministic=deterministic, kb=kb)
+                except Exception as e:
+                    yield i, e
+                    continue
+                self.log_run(result)
+                if include_pdf:
+                    self.save_report_for_download(result)
+                yield i, result
+            return
+
+        # future -> (chunk, attempt); a chunk lost to a broken pool is retried once on a new pool
+        pending = {}
+        submit = lambda chunk, attempt=0: self._submit_batch_chunk(pending, workers, chunk, attempt,
+                                                                  simulation_runs, deterministic)
+        chunk = []
+        for i, dna in dnas:
+            if isinstance(dna, Exception):
+                yield i, dna
+                continue
+            chunk.append((i, dna))
+            if len(chunk) == BATCH_CHUNK_SIZE:
+                submit(chunk)
+                chunk = []
+                # Stream whatever has finished while parsing continues
+                yield from self._drain_batch(pending, include_pdf, submit, timeout=0)
+        if chunk:
+            submit(chunk)
+        while pending:
+            yield from self._drain_batch(pending, include_pdf, submit)
+
+    def _submit_batch_chunk(self, pending, workers, chunk, attempt, simulation_runs, deterministic):
+        pool = self._get_batch_pool(workers)
+        try:
+            future = pool.submit(_run_batch_chunk, chunk, simulation_runs, deterministic)
+        except BrokenProcessPool:
+            self._discard_batch_pool(workers, pool)
+            future = self._get_batch_pool(workers).submit(_run_batch_chunk, chunk, simulation_runs, deterministic)
+        pending[future] = (chunk, attempt, workers, pool)
+
+    def _drain_batch(self, pending, include_pdf, submit, timeout=None):
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            chunk, attempt, workers, pool = pending.pop(future)
+            try:
+                results = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (killed, out of memory): replace the pool so later batches work
+                self._discard_batch_pool(workers, pool)
+                if attempt == 0:
+                    submit(chunk, 1)
+                    continue
+                results = [(i, e) for i, _ in chunk]
+            for i, result in results:
+                if not isinstance(result, Exception):
+                    self.log_run(result)
+                    if include_pdf:
+                        self.save_report_for_download(result)
+                yield i, result
+
+    def _parse_batch(self, ideas, kb):
+        # Yields (index, dna or the exception that parsing raised), so one bad idea fails alone
+        docs = self.nlp.pipe(ideas, batch_size=BATCH_NLP_SIZE) if self.nlp else None
+        for i, text in enumerate(ideas):
+            doc = None
+            if docs is not None:
+                try:
+                    doc = next(docs)
+                except Exception:
+                    # The pipe cannot be resumed; parse the rest one text at a time
+                    docs = None
+            try:
+                yield i, self.stage1_parsing(text, doc, kb)
+            except Exception as e:
+                yield i, e
+
+    def _get_batch_pool(self, workers):
+        # Concurrent batches share the pool; it is only shut down once broken.
+        # Workers start from a forkserver, not a fork of this threaded process.
+        with self._batch_pool_lock:
+            pool = self._batch_pools.get(workers)
+            if pool is None:
+                pool = self._batch_pools[workers] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context(BATCH_START_METHOD),
+                    initializer=_init_batch_worker)
+            return pool
+
+    def _discard_batch_pool(self, workers, pool):
+        with self._batch_pool_lock:
+            if self._batch_pools.get(workers) is pool:
+                del self._batch_pools[workers]
+        pool.shutdown(wait=False)
+
+    def stage1_parsing(self, text, doc=None, kb=None):
+        kb = kb if kb is not None else self.kb
         action =  "enable"
         target_user = "General User"
         domain = "Tech & SaaS" 
 
         if self.nlp:
-            doc = self.nlp(text)
+            if doc is None:
+                doc = self.nlp(text)
             verbs = [token.lemma_ for token in doc if token.pos_ == "VERB"]
             if verbs: action = verbs[0]
             for chunk in doc.noun_chunks:
@@ -90,28 +595,18 @@ class SimulationEngine:
         else:
             user_match = re.search(r'for\s+([\w\s]+?)(?:to|\s|$)', text, re.IGNORECASE)
             if user_match: target_user = user_match.group(1).strip()
-            
-        found_match = False
-        for p in self.personas:
-            if p['name'].split()[0].lower() in text.lower() or p['type'].lower() in text.lower():
-                target_user = p['type']
-                found_match = True
-                break
-        if not found_match:
-             if "student" in text.lower(): target_user = "Student"
-             elif "business" in text.lower() or "sme" in text.lower(): target_user = "Small Business Owner"
-             elif "farmer" in text.lower(): target_user = "Farmer"
-             elif "doctor" in text.lower(): target_user = "Doctor"
+
+        # Persona, fallback target, B2B and domain keywords in one pass over the text
+        found = kb.keyword_index.scan(text)
+        if "persona" in found:
+            target_user = found["persona"]
+        elif "target" in found:
+            target_user = found["target"]
         
-        is_b2b = False
-        if "business" in target_user.lower() or "sme" in target_user.lower() or "enterprise" in text.lower():
-            is_b2b = True
-
-        if "food" in text.lower(): domain = "Food & Hospitality"
-        elif "health" in text.lower(): domain = "Health & Wellness"
-        elif "shop" in text.lower() or "retail" in text.lower(): domain = "E-commerce & Retail"
-        elif "finance" in text.lower(): domain = "FinTech"
-        elif "education" in text.lower() or "learn" in text.lower(): domain = "EdTech"
+        target_lower = target_user.lower()
+        is_b2b = "business" in target_lower or "sme" in target_lower or "b2b" in found
+
+        domain = found.get("domain", domain)
         
         return {
             "action": action,
@@ -121,37 +616,35 @@ class SimulationEngine:
             "original_text": text
         }
 
-    def stage2_model_construction(self, dna):
+    def stage2_model_construction(self, dna, kb=None):
+        kb = kb if kb is not None else self.kb
         value_prop = f"{dna['action'].capitalize()} solution for {dna['target_user']}."
         selected_personas = []
-        scored_personas = []
-        for p in self.personas:
-            score = 0
-            if dna['target_user'].lower() in p['name'].lower() or dna['target_user'].lower() in p['type'].lower():
-                score += 5
-            scored_personas.append((score, p))
-        scored_personas.sort(key=lambda x: x[0], reverse=True)
-        
-        primary = scored_personas[0][1]
+        # First persona whose name or type mentions the target user, else the persona whose
+        # text best matches the idea, else the library head
+        primary = kb.persona_index.first_matching(dna['target_user'])
+        if primary is None:
+            best = kb.persona_search.search(dna['original_text'], k=1)
+            primary = kb.personas[best[0][0]] if best else kb.personas[0]
         selected_personas.append(primary)
         
         types_needed = ["Early Adopter", "Economic Buyer"]
         if primary['type'] in types_needed: types_needed.remove(primary['type'])
         for t in types_needed:
-            found = next((p for p in self.personas if p['type'] == t and p['id'] != primary['id']), self.personas[0])
+            found = kb.persona_index.first_of_type(t, exclude_id=primary['id']) or kb.personas[0]
             selected_personas.append(found)
 
         return {"value_prop": value_prop, "personas": selected_personas}
 
-    def stage3_env_calc(self, model, dna):
-        # Deterministic scoring
-        trust_score = random.randint(60, 90) # Baseline
-        if dna['domain'] == "FinTech" or dna['domain'] == "Health & Wellness":
-            trust_score -= 20 # Harder to get trust
+    def stage3_env_calc(self, model, dna, rng=None):
+        # Deterministic scoring when given a seeded rng
+        rng = rng if rng is not None else self.rng
+        trust_score = int(rng.integers(60, 91)) # Baseline
+        if dna['domain'] in LOW_TRUST_DOMAINS:
+            trust_score -= LOW_TRUST_PENALTY # Harder to get trust
             
-        income_map = {"Deprived": 90, "Aspirers": 70, "Middle Class": 50, "Affluent": 30, "Elite": 10}
         primary_persona = model['personas'][0]
-        income_idx = income_map.get(primary_persona['income_level'], 50)
+        income_idx = INCOME_PRESSURE.get(primary_persona['income_level'], 50)
         
         price_fit = 100 - (income_idx * 1.0)
         
@@ -165,33 +658,100 @@ class SimulationEngine:
             "avg_score": (trust_score + int(price_fit) + 60 + primary_persona['digital_literacy']) / 4
         }
 
-    def stage4_collision(self, model, env):
-        # 1000 Run Simulation
-        failures = { "Trust Collisions": 0, "Adoption Friction": 0, "Price Misfits": 0, "Timing Misfires": 0 }
-        p_trust = (100 - env['trust']) / 100.0
-        p_price = (100 - env['price_fit']) / 100.0
-        
-        for _ in range(1000):
-            r = random.random()
-            if r < p_trust: failures["Trust Collisions"] += 1
-            if r < p_price: failures["Price Misfits"] += 1
-            
-        top_blocker = max(failures, key=failures.get)
-        severity = failures[top_blocker] / 1000.0 * 10
+    def stage4_collision(self, model, env, simulation_runs=DEFAULT_SIMULATION_RUNS, rng=None, tolerance=None):
+        # `tolerance` switches to adaptive sampling, with simulation_runs as the cap
+        runs = int(simulation_runs)
+        if runs < 1 or runs > MAX_SIMULATION_RUNS:
+            raise ValueError(f"simulation_runs must be between 1 and {MAX_SIMULATION_RUNS}")
+        if tolerance is not None and not MIN_TOLERANCE <= tolerance <= MAX_TOLERANCE:
+            raise ValueError(f"tolerance must be between {MIN_TOLERANCE} and {MAX_TOLERANCE}")
+
+        # Per-run failure probability of each blocker, in BLOCKER_TYPES order
+        p_fail = np.array([
+            (100 - env['trust']) / 100.0,
+            (100 - env['digital_literacy']) / 100.0,
+            (100 - env['price_fit']) / 100.0,
+            (100 - env['infrastructure']) / 100.0,
+        ]).clip(0.0, 1.0)
+
+        # Each blocker is an independent Bernoulli draw per run, so the failure
+        # count over `runs` runs is Binomial(runs, p). One vectorized draw covers
+        # all four blockers regardless of the run count.
+        rng = rng if rng is not None else self.rng
+        adaptive = None
+        if tolerance is None:
+            failures = rng.binomial(runs, p_fail)
+        else:
+            failures, runs, adaptive = self._adaptive_failures(p_fail, runs, tolerance, rng)
+        probs = failures / runs
+        ci_low, ci_high = self._wilson_interval(probs, runs)
+
+        top_idx = int(np.argmax(failures))
+        top_blocker = BLOCKER_TYPES[top_idx]
+        severity = probs[top_idx] * 10
         
         descriptions = {
             "Trust Collisions": "Users unsure about data prop.",
-            "Price Misfits": "Value perception mismatch."
+            "Adoption Friction": "Onboarding too demanding for the target user's digital skills.",
+            "Price Misfits": "Value perception mismatch.",
+            "Timing Misfires": "Supporting infrastructure not ready for launch."
         }
+
+        blockers = {}
+        for i, name in enumerate(BLOCKER_TYPES):
+            blockers[name] = {
+                "failures": int(failures[i]),
+                "probability": round(float(probs[i]), 4),
+                "ci_low": round(float(ci_low[i]), 4),
+                "ci_high": round(float(ci_high[i]), 4)
+            }
         
-        return {
+        result = {
             "primary_blocker": {
                 "type": top_blocker,
-                "severity": round(severity, 1),
-                "affected_percent": int((failures[top_blocker]/1000)*100),
+                "severity": round(float(severity), 1),
+                "affected_percent": int(probs[top_idx] * 100),
                 "description": descriptions.get(top_blocker, "General Friction")
-            }
+            },
+            "blockers": blockers,
+            "simulation_runs": runs
         }
+        if adaptive is not None:
+            result["adaptive"] = adaptive
+        return result
+
+    def _adaptive_failures(self, p_fail, max_runs, tolerance, rng):
+        # Failure counts drawn chunk by chunk until the widest Wilson half-width is within
+        # `tolerance`. Chunk i always has the same size and its own child stream of one
+        # SeedSequence, so a seeded run reproduces exactly however the chunks are scheduled.
+        seeds = np.random.SeedSequence(int(rng.integers(2**63)))
+        failures = np.zeros(len(p_fail), dtype=np.int64)
+        runs = chunks = 0
+        half_width = 1.0
+        while runs < max_runs and half_width > tolerance:
+            # Chunks grow with the sample so far: at most 25% overshoot, few iterations
+            chunk = min(max(ADAPTIVE_CHUNK_RUNS, runs // 4), max_runs - runs)
+            failures += np.random.default_rng(seeds.spawn(1)[0]).binomial(chunk, p_fail)
+            runs += chunk
+            chunks += 1
+            ci_low, ci_high = self._wilson_interval(failures / runs, runs)
+            half_width = float(np.max(ci_high - ci_low)) / 2
+        adaptive = {
+            "tolerance": tolerance,
+            "converged": half_width <= tolerance,
+            "ci_half_width": round(half_width, 5),
+            "chunks": chunks,
+            "max_runs": max_runs
+        }
+        return failures, runs, adaptive
+
+    @staticmethod
+    def _wilson_interval(probs, runs, z=1.96):
+        # 95% Wilson score interval, well-behaved near p=0 and p=1
+        denom = 1 + z * z / runs
+        centre = (probs + z * z / (2 * runs)) / denom
+        half = z * np.sqrt(probs * (1 - probs) / runs + z * z / (4 * runs * runs)) / denom
+        return np.clip(centre - half, 0.0, 1.0), np.clip(centre + half, 0.0, 1.0)
 
     def stage5_mutations(self, blocker_analysis):
         return {
@@ -199,63 +759,42 @@ class SimulationEngine:
             "next_step": {"description": "Scale Partnerships", "cost_inr": 200000, "complexity": 3}
         }
 
-    def analyze_competitors(self, dna, env):
+    def analyze_competitors(self, dna, env, kb=None):
         # -- STEP 2: COMPETITOR WEAKNESS ENGINE --
-        domain_map = {
-            "Tech & SaaS": "tech_saas",
-            "Food & Hospitality": "food_hospitality",
-            "EdTech": "edtech",
-            "FinTech": "fintech",
-            "Health & Wellness": "health_wellness",
-            "E-commerce & Retail": "retail_ecommerce"
-        }
+        kb = kb if kb is not None else self.kb
+        db_key = COMPETITOR_DOMAINS.get(dna['domain'], "tech_saas")
+        domain = kb.competitor_index.get(db_key) or kb.competitor_index.get("tech_saas")
         
-        db_key = domain_map.get(dna['domain'], "tech_saas")
-        competitors = self.competitors_db.get(db_key, self.competitors_db.get("tech_saas"))
-        
-        # Fallback if still None or empty
-        if not competitors:
+        if domain is None:
             print(f"WARNING: No competitors found for {dna['domain']} (mapped to {db_key}). check competitor_database.json")
-            competitors = []
-
-        # Select 3 relevant
-        selected = competitors[:3] if competitors else []
-        
-        # Create a dummy competitor if absolutely nothing exists to prevent crash
-        if not selected:
-             selected = [{
-                 "name": "Generic Incumbent",
-                 "weaknesses": {
-                     "pricing": {"score": 5, "desc": "Standard market pricing"},
-                     "features": {"score": 5, "desc": "Standard feature set"},
-                     "ux": {"score": 5, "desc": "Average UX"},
-                     "coverage": {"score": 5, "desc": "Average coverage"}
-                 }
-             }]
+            # Dummy competitor if absolutely nothing exists to prevent crash
+            scored = [({
+                "name": "Generic Incumbent",
+                "weaknesses": {
+                    "pricing": {"score": 5, "desc": "Standard market pricing"},
+                    "features": {"score": 5, "desc": "Standard feature set"},
+                    "ux": {"score": 5, "desc": "Average UX"},
+                    "coverage": {"score": 5, "desc": "Average coverage"}
+                }
+            }, 5.0, 5.0, "pricing")]
+        else:
+            # Score every competitor in the domain and keep the most exploitable ones.
+            # Impact (how much a weakness matters to THIS user) depends on the persona,
+            # e.g. pricing weaknesses matter more to a price-sensitive Student.
+            scored = domain.top_exploitable(kb.competitor_index.impact_weights(dna['target_user']))
         
         # Analyze Weaknesses
         total_exploitable_score = 0
         analyzed_competitors = []
         
-        for comp in selected:
-            # Calculate aggregate weakness score
-            w = comp['weaknesses']
-            avg_weakness = (w['pricing']['score'] + w['features']['score'] + w['ux']['score'] + w['coverage']['score']) / 4
-            
-            # Impact Score (How much it matters to THIS user)
-            # If user is price sensitive (e.g. Student), Pricing weakness matters more
-            impact = 1.0
-            if "Student" in dna['target_user'] and w['pricing']['score'] > 6: impact = 1.5
-            
-            exploitability = avg_weakness * impact
+        for comp, avg_weakness, exploitability, primary_weakness in scored:
             total_exploitable_score += exploitability
-            
             analyzed_competitors.append({
                 "name": comp['name'],
                 "weakness_score": round(avg_weakness, 1),
                 "exploitability": round(exploitability, 1),
-                "primary_weakness": max(w.items(), key=lambda x: x[1]['score'])[0], # key with max score
-                "details": w
+                "primary_weakness": primary_weakness,
+                "details": comp['weaknesses']
             })
             
         # Market Share Potential (0-100%)
@@ -281,22 +820,33 @@ class SimulationEngine:
             "market_share_potential": capture_potential,
             "primary_attack_vector": vectors[primary_vector_key],
             "total_exploitable_score": round(total_exploitable_score, 1),
-            "domain_key": db_key
+            "domain_key": db_key,
+            # Competitors from any domain whose descriptions best match the idea text
+            "related_competitors": [
+                {"name": kb.competitor_catalog[i][1]['name'], "domain_key": kb.competitor_catalog[i][0], "relevance": score}
+                for i, score in kb.competitor_search.search(dna['original_text'])
+            ]
         }
 
     def stage7_north_star(self, dna):
         return {"metric": "Competitor Disruption Score", "badge_level": 5, "justification": "Market Share Velocity"}
 
-    def stage8_assembly(self, dna, north_star, model, blocker, mutations, competitor_map, env):
-        report_id = f"SIM_{hashlib.md5(str(time.time()).encode()).hexdigest()[:8].upper()}"
+    def stage8_assembly(self, dna, north_star, model, blocker, mutations, competitor_map, env, kb=None):
+        kb = kb if kb is not None else self.kb
+        # 64 random bits: unique across concurrent requests and workers
+        report_id = f"SIM_{secrets.token_hex(8).upper()}"
         
-        # --- Lightweight Market Calc (Restoring missing PDF keys) ---
-        tam = 50000000 # 50M Base
-        if dna['is_b2b']: tam = 8000000
-        elif "Student" in dna['target_user']: tam = 40000000
+        # --- Market sizing from the demographic cube ---
+        inc_level = model['personas'][0]['income_level']
+        if dna['is_b2b']:
+            # Same serviceable share as the consumer market
+            all_tam, all_sam = kb.market_cube.tam_sam()
+            tam = B2B_TAM
+            sam = int(tam * all_sam / all_tam) if all_tam else 0
+        else:
+            tam, sam = kb.market_cube.tam_sam(incomes=[inc_level] if inc_level in kb.market_cube.incomes else None)
         
         # Simple RPU estimate
-        inc_level = model['personas'][0]['income_level']
         rpu = 500 # Fallback
         if "High" in inc_level or "Affluent" in inc_level: rpu = 1500
         elif "Deprived" in inc_level: rpu = 50
@@ -313,13 +863,14 @@ class SimulationEngine:
             "target_user": dna['target_user'],
             "target_user_segment": model['personas'][0]['name'],
             "tam": tam,
+            "sam": sam,
             "users": users,
             "rpu": rpu,
             "income_level": inc_level,
             "competitor_count": 12, 
             
             # Re-add other keys PDF expects
-            "simulation_runs": 1000,
+            "simulation_runs": blocker['simulation_runs'],
             "blocker_impact_pct": blocker['primary_blocker']['affected_percent'],
             "market_timing": "Opportunistic",
             "infrastructure_score": env['infrastructure'],
@@ -372,12 +923,58 @@ class SimulationEngine:
         }
 
     def save_report_for_download(self, final_output):
-        sim_data = final_output['sim_data_flat']
-        filename = f"Report_{sim_data['report_id']}.pdf"
-        filepath = os.path.join('/tmp', filename)
-        generate_detailed_pdf(sim_data, filepath)
-        self.report_cache[sim_data['report_id']] = filepath
-        self.report_cache[final_output['report_id']] = filepath
-
-    def get_report_path(self, report_id):
-        return self.report_cache.get(report_id)
+        self.report_store.put(final_output['sim_data_flat'])
+        if self.prerender_reports:
+            self.report_store.prerender(final_output['report_id'])
+
+    def log_run(self, final_output, timings=None):
+        # Buffered; the run log writes from its own thread
+        if self.run_log is not None:
+            self.run_log.append(final_output['sim_data_flat'], timings)
+
+    def get_report_pdf(self, report_id):
+        # (path, None) or (None, pdf_bytes); renders the PDF on first request
+        if not report_id:
+            return None
+        return self.report_store.get_pdf(report_id)
+
+    def get_portfolio_pdf(self, filename, report_ids=None, ideas=None, simulation_runs=DEFAULT_SIMULATION_RUNS,
+                          deterministic=None, workers=None):
+        # Writes one PDF ranking earlier reports (`report_ids`) or freshly simulated `ideas`
+        # into `filename`, a path or a writable binary file object.
+        # Raises KeyError listing report ids that are unknown or expired, and
+        # RuntimeError naming the first idea whose simulation failed.
+        if report_ids is not None:
+            results = [self.report_store.get_sim_data(report_id) for report_id in report_ids]
+            missing = [r for r, data in zip(report_ids, results) if data is None]
+            if missing:
+                raise KeyError(', '.join(missing))
+        else:
+            results = [None] * len(ideas)
+            # Not registered for download: hundreds of portfolio runs would push other
+            # users' reports out of the store, and the portfolio PDF holds every report anyway
+            for i, result in self.run_batch(ideas, simulation_runs, deterministic=deterministic):
+                if isinstance(result, Exception):
+                    raise RuntimeError(f"Simulation failed for idea {i}: {result}") from result
+                results[i] = result['sim_data_flat']
+        with METRICS.span("idea_sim_stage_seconds", stage="portfolio_render"):
+            generate_portfolio_pdf(results, filename, workers)
+
+
+# --- Batch process-pool workers (module level so they can be pickled) ---
+_worker_engine = None
+
+def _init_batch_worker():
+    global _worker_engine
+    # Parsing happens in the parent, so workers skip the spaCy load
+    _worker_engine = SimulationEngine(use_nlp=False)
+
+def _run_batch_chunk(chunk, simulation_runs, deterministic):
+    _worker_engine.maybe_reload_knowledge_base()
+    results = []
+    for i, dna in chunk:
+        try:
+            results.append((i, _worker_engine.run_from_dna(dna, simulation_runs, deterministic=deterministic)))
+        except Exception as e:
+            results.append((i, e))
+    return results
@@ -0,0 +1,52 @@
+import gzip
+import hashlib
+from flask import Response
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it, clients get gzip
+    brotli = None
+
+# Responses whose bodies never change while the process runs (the front page,
+# the idea catalog). Each body is compressed once when it is registered; a
+# request then only negotiates the encoding and checks its validator.
+MIN_COMPRESS_BYTES = 512
+
+class StaticAsset:
+    def __init__(self, body, mimetype, cache_control):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(body, quality=11)
+            self.encodings["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        # One strong validator per representation
+        self.etags = {enc: digest if enc == "identity" else f"{digest}-{enc}" for enc in self.encodings}
+
+    def _encoding(self, accept_encoding):
+        # Best encoding the client accepts; brotli first, as it is smaller
+        accepted = parse_accept_header(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and accepted.quality(encoding) > 0:
+                return encoding
+        return "identity"
+
+    def response(self, request):
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        encoding = self._encoding(request.headers.get('Accept-Encoding', ''))
+        # Any variant's validator proves the client already has this content
+        if any(request.if_none_match.contains_weak(tag) for tag in self.etags.values()):
+            response = Response(status=304, headers=headers)
+            response.set_etag(self.etags[encoding])
+            return response
+        response = Response(self.encodings[encoding], mimetype=self.mimetype, headers=headers)
+        if encoding != "identity":
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etags[encoding])
+        return response
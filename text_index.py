@@ -0,0 +1,122 @@
+import re
+import numpy as np
+
+# BM25 retrieval over short catalog texts (competitor descriptions, persona
+# goals), built once per knowledge base load. The document-term matrix is
+# kept column-wise (one postings slice per term, CSC style), so scoring a
+# query is a sparse matrix-vector product: gather the postings of the query's
+# terms and sum them per document with one bincount.
+K1 = 1.2
+B = 0.75
+TOP_K = 5
+SMALL_INDEX_DOCS = 2048
+# Per-index caches of query term ids (by text) and results (by term ids), cleared when full
+QUERY_CACHE_SIZE = 1024
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to with "
+    "who what which when where how all any can will into over more less very".split()
+)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        # Plural folding, enough to match "students" with "Student"
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class TextIndex:
+    def __init__(self, texts):
+        self.size = len(texts)
+        self.vocab = {}
+        term_ids, doc_ids = [], []
+        lengths = np.zeros(self.size, dtype=np.float64)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc] = len(tokens)
+            for token in tokens:
+                term_ids.append(self.vocab.setdefault(token, len(self.vocab)))
+                doc_ids.append(doc)
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int64)
+
+        # (term, doc) pairs with their counts, sorted by term then doc
+        pairs, tf = np.unique(term_ids * max(self.size, 1) + doc_ids, return_counts=True)
+        terms, self.postings = np.divmod(pairs, max(self.size, 1))
+        self.indptr = np.searchsorted(terms, np.arange(len(self.vocab) + 1))
+
+        df = np.diff(self.indptr)
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if self.size else 0.0
+        norm = K1 * (1 - B + B * lengths[self.postings] / (avg_length or 1.0))
+        # BM25 weight of each (term, doc) entry
+        self.weights = idf[terms] * tf * (K1 + 1) / (tf + norm)
+        # Per-term views into the column arrays, so a query does no slicing
+        self.columns = [(self.postings[lo:hi], self.weights[lo:hi]) for lo, hi in zip(self.indptr[:-1], self.indptr[1:])]
+        # Small catalogs score faster in plain Python than through numpy's per-call overhead
+        self.small = self.size <= SMALL_INDEX_DOCS
+        if self.small:
+            self.lists = [(docs.tolist(), weights.tolist()) for docs, weights in self.columns]
+        self.terms_cache = {}
+        self.search_cache = {}
+
+    def query_terms(self, text):
+        # Term ids of `text` found in the index; scores depend on nothing else about the text
+        terms = self.terms_cache.get(text)
+        if terms is None:
+            vocab = self.vocab
+            terms = tuple(sorted({vocab[t] for t in tokenize(text) if t in vocab}))
+            if len(self.terms_cache) >= QUERY_CACHE_SIZE:
+                self.terms_cache.clear()
+            self.terms_cache[text] = terms
+        return terms
+
+    def scores(self, text):
+        # BM25 score of `text` against every document (0 where no term is shared)
+        columns = [self.columns[c] for c in self.query_terms(text)]
+        if not columns:
+            return np.zeros(self.size)
+        if len(columns) == 1:
+            docs, weights = columns[0]
+        else:
+            docs = np.concatenate([d for d, _ in columns])
+            weights = np.concatenate([w for _, w in columns])
+        return np.bincount(docs, weights=weights, minlength=self.size)
+
+    def search(self, text, k=TOP_K):
+        # [(document index, score)], best first; documents sharing no term are left out.
+        # Earlier catalog entries win ties.
+        terms = self.query_terms(text)
+        key = (terms, k)
+        hits = self.search_cache.get(key)
+        if hits is None:
+            hits = self._search_small(terms, k) if self.small else self._search_large(text, k)
+            if len(self.search_cache) >= QUERY_CACHE_SIZE:
+                self.search_cache.clear()
+            self.search_cache[key] = hits
+        return list(hits)
+
+    def _search_small(self, terms, k):
+        totals = {}
+        for c in terms:
+            docs, weights = self.lists[c]
+            for doc, weight in zip(docs, weights):
+                totals[doc] = totals.get(doc, 0.0) + weight
+        # Ranked on the rounded score, so summation order cannot break a tie differently
+        best = sorted(((doc, round(score, 4)) for doc, score in totals.items()), key=lambda x: (-x[1], x[0]))
+        return best[:k]
+
+    def _search_large(self, text, k):
+        scores = np.round(self.scores(text), 4)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            # Everything scoring at least the k-th best, so no entry tied at the cut is lost
+            kth = -np.partition(-scores[matched], k - 1)[k - 1]
+            matched = matched[scores[matched] >= kth]
+        # matched is in catalog order and the sort is stable, so earlier entries win ties
+        order = matched[np.argsort(-scores[matched], kind='stable')][:k]
+        return list(zip(order.tolist(), scores[order].tolist()))